@@ -7,13 +7,35 @@ from tkinter.messagebox import showerror
 from tkinter.scrolledtext import ScrolledText
 import tkinter.ttk as ttk
 from PIL.ImageTk import PhotoImage
-from PIL import Image
 from MP3.too_easy_mp3 import SimpleMP3, supported_tags, TagError
-from os import remove, listdir, popen
+from os import listdir, popen, stat, scandir
 from threading import Thread
-from os.path import sep
-from shutil import copyfile
+import queue
+from os.path import sep, split, abspath, normcase
 import auto.auto_tagger as tagger
+import auto.search
+import auto.thumbnails
+import auto.prefetch
+import auto.batch
+import auto.worker
+import time
+
+
+SORT_FIELDS = {'Folder': None, 'Name': 'name', 'Artist': 'artist', 'Album': 'album', 'Track': 'number',
+               'Title': 'title', 'Size': 'size', 'Modified': 'mtime'}
+
+GROUP_HEIGHT = 22
+
+FILE_HEIGHT = 46
+
+NEIGHBOURS = 3
+
+NO_IMAGE = f'.{sep}images{sep}no_image.png'
+
+THUMBNAILS = f'.{sep}temp{sep}thumbnails'
+
+WORK_LISTS = {'Folder': None, 'No title': 'missing-title', 'No artist': 'missing-artist', 'No album': 'missing-album',
+              'No cover': 'missing-cover', 'Changed today': 'changed-since'}
 
 
 class LoadingFrame(ttk.Frame):
@@ -87,16 +109,19 @@ class LoadingFrame(ttk.Frame):
 
 class File(Frame):
     """Widget that makes audio file representation"""
-    def __init__(self, parent=None, file_path='', style='File', **options):
+    def __init__(self, parent=None, file_path='', style='File', catalog=None, entry=None, **options):
         """
         Construct a new 'File' object using mp3 file.
 
         :param style: string with style name.
         :param file_path: path to file.
+        :param catalog: auto.catalog.Catalog used to read tags instead of file.
+        :param entry: already read auto.catalog.CatalogEntry of file.
         :return returns nothing.
         """
         Frame.__init__(self, parent, options)
-        self.file = SimpleMP3(file_path)
+        self.catalog = catalog
+        self.file = entry or self.read_file(file_path)
         self.style = style
         self.cur_style = self.style
         self.active = False
@@ -104,9 +129,10 @@ class File(Frame):
         self.background = None
 
         self.var = IntVar()
+        self.height = FILE_HEIGHT
 
         self.canvas = Canvas(self, bg=ttk.Style().lookup(self.cur_style + '.Canvas', 'bg'),
-                             height=46, highlightthickness=0)
+                             height=self.height, highlightthickness=0)
         self.canvas.pack(side=RIGHT, expand=YES, fill=X)
         self.draw_content()
 
@@ -144,6 +170,19 @@ class File(Frame):
         self.canvas.create_window(2, 19, window=self.checkbutton, anchor=W, tag='file')
         self.canvas.create_text(31, 22, text=self.file.path.split(sep)[-1], tag='text', fill='#4f4f4f', anchor=W)
 
+    def read_file(self, path):
+        """
+        Return catalog entry of file, or SimpleMP3 object when there is no catalog.
+
+        :param path: path to file.
+        :return returns object with SimpleMP3 like access to tags.
+        """
+        if self.catalog:
+            entry = self.catalog.entry(path)
+            if entry:
+                return entry
+        return SimpleMP3(path)
+
     def refresh(self, style=None):
         """
         Reload audio file.
@@ -155,33 +194,51 @@ class File(Frame):
             self.cur_style = style
             self.background = ttk.Style().lookup(self.cur_style + '.Canvas', 'bg')
         self.canvas.config(bg=self.background)
-        self.file = SimpleMP3(self.file.path)
-        self.canvas.delete('text')
+        self.file = self.read_file(self.file.path)
+        self.canvas.delete('text', 'file')
+        if self.checkbutton:
+            self.checkbutton.destroy()
         self.draw_content()
 
+    def set_style(self, style=None, active=None):
+        """
+        Change style of widget without reading file again.
+
+        :param style: name of base style, current one is kept if it's None.
+        :param active: new value of active attribute, current one is kept if it's None.
+        :return returns nothing.
+        """
+        if style:
+            self.style = style
+        if active is not None:
+            self.active = active
+        cur_style = self.style + '.Active' if self.active else self.style
+        if cur_style == self.cur_style and self.background:
+            return
+        self.cur_style = cur_style
+        self.background = ttk.Style().lookup(self.cur_style + '.Canvas', 'bg')
+        self.canvas.config(bg=self.background)
+        if self.checkbutton:
+            self.checkbutton.config(style=self.cur_style + '.TCheckbutton')
+
     def refresh_state(self):
         """
         Change style and active attribute.
 
         :return returns nothing.
         """
-        if self.active:
-            self.refresh(style=self.style)
-            self.active = False
-        else:
-            self.refresh(self.style + '.Active')
-            self.background = ttk.Style().lookup(self.cur_style + '.Canvas', 'bg')
-            self.active = True
+        self.set_style(active=not self.active)
 
 
 class FileSection(Frame):
     """Widget that provides section of 'File' widgets"""
-    def __init__(self, parent=None, dir_='', styles=None, **options):
+    def __init__(self, parent=None, dir_='', styles=None, catalog=None, **options):
         """
         Construct a new 'FileSection' object using path to directory with mp3 files.
 
         :param dir_: string with path to directory.
         :param styles: list with names of styles that be used to create 'File' widgets one by one.
+        :param catalog: auto.catalog.Catalog used to read tags, only changed files are read from disk.
         :attribute first_file: path to first audio file in directory.
         :return returns nothing.
         """
@@ -210,8 +267,34 @@ class FileSection(Frame):
         self.cur_dir = Label(cur_dir_holder, text=text,
                              font='Verdana 13', bg='white')
         self.cur_dir.pack(side=TOP, fill=BOTH, pady=1)
+        self.dir_ = dir_
         self.styles = styles
+        self.row_styles = list(styles)
+        self.catalog = catalog
         self.files = dict()
+        self.windows = dict()
+        self.window_names = dict()
+        self.positions = dict()
+        self.records = dict()
+        self.order = list()
+        self.sorted = dict()
+        self.shown = list()
+        self.index = auto.search.TokenIndex()
+
+        self.search = StringVar()
+        search_entry = ttk.Entry(cur_dir_holder, textvariable=self.search)
+        search_entry.pack(side=TOP, fill=X, padx=1, pady=1)
+        self.search.trace_add('write', lambda *args: self.update_view())
+
+        view_holder = Frame(cur_dir_holder, bg='white')
+        view_holder.pack(side=TOP, fill=X, padx=1, pady=1)
+        self.sort_field = StringVar(value='Folder')
+        self.group = IntVar()
+        ttk.Combobox(view_holder, textvariable=self.sort_field, values=list(SORT_FIELDS), state='readonly', width=10,
+                     takefocus=False).pack(side=LEFT, expand=YES, fill=X)
+        ttk.Checkbutton(view_holder, text='Group', variable=self.group, takefocus=False).pack(side=RIGHT, padx=3)
+        self.sort_field.trace_add('write', lambda *args: self.update_view())
+        self.group.trace_add('write', lambda *args: self.update_view())
 
         self.canvas = Canvas(self, bg=self['bg'], highlightthickness=0, width=self['width'])
         self.sbar = Scrollbar(self)
@@ -232,6 +315,9 @@ class FileSection(Frame):
         """
         scroll_region_max_y = 0
         self.first_file = None
+        self.order = list()
+        self.sorted = dict()
+        entries = self.catalog.scan_dir(dir_) if self.catalog else dict()
 
         for file in listdir(dir_):
             if not file.endswith('.mp3'):
@@ -240,27 +326,237 @@ class FileSection(Frame):
             if not self.first_file:
                 self.first_file = dir_ + sep + file
 
-            style = self.styles[0]
-            self.styles = self.styles[1:]
-            self.styles.append(style)
+            widget = self.add_file(file, scroll_region_max_y, entry=entries.get(file))
+            scroll_region_max_y += widget.height
+
+        self.canvas.config(scrollregion=(0, 0, 0, scroll_region_max_y))
+        self.shown = list(self.order)
+        if self.search.get() or SORT_FIELDS.get(self.sort_field.get()):
+            self.update_view()
+
+    def add_file(self, name, y, entry=None):
+        """
+        Create 'File' widget of file from current directory at y, index it and bind events to it.
 
-            path = dir_ + sep + file
-            widget = File(self.canvas, path, style=style)
-            self.canvas.create_window(0, scroll_region_max_y, window=widget, anchor=NW, tag='file')
-            self.files[file] = widget
-            widget.canvas.bind('<1>', (lambda event, widget_=widget: self.on_click(widget_)))
-            widget.canvas.bind('<Double-1>', (lambda event, widget_=widget: self.on_double(widget_)))
-            self.bind_all('<Up>', (lambda event: print(event.widget)))
+        :param name: file name.
+        :param y: vertical position of widget on canvas.
+        :param entry: already read auto.catalog.CatalogEntry of file.
+        :return returns created 'File' widget.
+        """
+        style = self.styles[0]
+        self.styles = self.styles[1:]
+        self.styles.append(style)
 
-            scroll_region_max_y += int(widget.canvas['height'])
+        widget = File(self.canvas, self.dir_ + sep + name, style=style, catalog=self.catalog, entry=entry)
+        self.windows[name] = self.canvas.create_window(0, y, window=widget, anchor=NW, tag='file')
+        self.window_names[self.windows[name]] = name
+        self.positions[name] = y
+        self.files[name] = widget
+        self.order.append(name)
+        self.index_file(name)
+        widget.canvas.bind('<1>', (lambda event, widget_=widget: self.on_click(widget_)))
+        widget.canvas.bind('<Double-1>', (lambda event, widget_=widget: self.on_double(widget_)))
+        self.bind_all('<Up>', (lambda event: print(event.widget)))
 
-            widget.canvas.bind('<MouseWheel>', (lambda event:
-                                                self.canvas.yview_scroll(int(-2*(event.delta/120)), 'units')))
+        widget.canvas.bind('<MouseWheel>', (lambda event:
+                                            self.canvas.yview_scroll(int(-2*(event.delta/120)), 'units')))
 
-            widget.checkbutton.bind('<MouseWheel>', (lambda event:
-                                                     self.canvas.yview_scroll(int(-2 * (event.delta / 120)), 'units')))
+        widget.checkbutton.bind('<MouseWheel>', (lambda event:
+                                                 self.canvas.yview_scroll(int(-2 * (event.delta / 120)), 'units')))
+        return widget
 
-        self.canvas.config(scrollregion=(0, 0, 0, scroll_region_max_y))
+    def remove_file(self, name):
+        """
+        Destroy 'File' widget of file which was deleted from directory and forget it.
+
+        :param name: file name.
+        :return returns nothing.
+        """
+        widget = self.files.pop(name)
+        if widget is self.prev_widget:
+            self.prev_widget = None
+        self.window_names.pop(self.windows[name], None)
+        self.positions.pop(name, None)
+        self.canvas.delete(self.windows.pop(name))
+        widget.destroy()
+        self.order.remove(name)
+        self.records.pop(name, None)
+        self.index.remove(name)
+        self.sorted = dict()
+
+    def refresh_files(self, paths):
+        """
+        Read again only files from paths(e.g. files changed by auto tagger) and redraw their rows.  Paths outside
+        current directory are skipped.
+
+        :param paths: list of paths to files.
+        :return returns number of refreshed rows.
+        """
+        folder = normcase(abspath(self.dir_))
+        count = 0
+        for el in paths:
+            head, name = split(abspath(el))
+            if normcase(head) != folder or name not in self.files:
+                continue
+            self.files[name].refresh()
+            self.index_file(name)
+            count += 1
+        if count and (self.search.get() or SORT_FIELDS.get(self.sort_field.get())):
+            self.update_view()
+        return count
+
+    def sync(self):
+        """
+        Bring section up to date with current directory: rows of files whose size or modification time differs
+        from their records are read again, rows of new files are added and rows of deleted files are removed.
+        Unchanged files aren't read.
+
+        :return returns nothing.
+        """
+        found = dict()
+        with scandir(self.dir_) as entries:
+            for el in entries:
+                if el.name.endswith('.mp3') and el.is_file():
+                    found[el.name] = el.stat()
+
+        changed = list()
+        for name, st in found.items():
+            record = self.records.get(name)
+            if record and (record['size'], record['mtime']) != (st.st_size, st.st_mtime_ns):
+                changed.append(self.dir_ + sep + name)
+        self.refresh_files(changed)
+
+        removed = [name for name in self.files if name not in found]
+        for name in removed:
+            self.remove_file(name)
+        added = [name for name in found if name not in self.files]
+        for name in added:
+            self.add_file(name, 0)
+        if removed or added:
+            self.first_file = self.dir_ + sep + self.order[0] if self.order else None
+            self.update_view()
+
+    def index_file(self, name):
+        """
+        Make in-memory record of file and add its tags and name to search index.
+
+        :param name: file name.
+        :return returns nothing.
+        """
+        audio = self.files[name].file
+        size = getattr(audio, 'size', None)
+        mtime = getattr(audio, 'mtime_ns', None)
+        if size is None:
+            try:
+                st = stat(audio.path)
+                size, mtime = st.st_size, st.st_mtime_ns
+            except OSError:
+                pass
+        record = auto.search.make_record(name, audio, size=size, mtime=mtime)
+        self.records[name] = record
+        self.sorted = dict()
+        self.index.add(name, [name, record['title'], record['artist'], record['album']])
+
+    def update_view(self):
+        """
+        Show files which match every word of search box as prefix of their title, artist, album or name words,
+        sorted and grouped by chosen field.  Only in-memory records are used, files aren't read.
+
+        :return returns nothing.
+        """
+        field = SORT_FIELDS.get(self.sort_field.get())
+        if field is None:
+            names = self.order
+        else:
+            if field not in self.sorted:
+                self.sorted[field] = auto.search.sort_names(self.records, self.order, field)
+            names = self.sorted[field]
+
+        found = self.index.search(self.search.get())
+        if found is not None:
+            names = [name for name in names if name in found]
+
+        groups = None
+        if field and self.group.get():
+            groups = auto.search.group_names(self.records, names, field)
+        self.layout(names, groups=groups)
+
+    def layout(self, names, groups=None):
+        """
+        Show 'File' widgets of names one under another in given order and hide others, restyle rows so their styles
+        alternate again.  Only rows which are shown or hidden, or whose position changed, are touched.
+
+        :param names: list of file names.
+        :param groups: list of (label, names) which are shown under group labels instead of names.
+        :return returns nothing.
+        """
+        visible = set(names)
+        shown = set(self.shown)
+        for name in self.shown:
+            if name not in visible:
+                self.canvas.itemconfigure(self.windows[name], state='hidden')
+        self.canvas.delete('group')
+        if groups is None:
+            groups = [(None, names)]
+        y = 0
+        i = 0
+        for label, group in groups:
+            if label is not None:
+                self.canvas.create_text(6, y + GROUP_HEIGHT // 2, text=label, anchor=W, tag='group',
+                                        font='Verdana 9 bold')
+                y += GROUP_HEIGHT
+            for name in group:
+                widget = self.files[name]
+                widget.set_style(self.row_styles[i % len(self.row_styles)])
+                if self.positions.get(name) != y:
+                    self.canvas.coords(self.windows[name], 0, y)
+                    self.positions[name] = y
+                if name not in shown:
+                    self.canvas.itemconfigure(self.windows[name], state='normal')
+                y += widget.height
+                i += 1
+        self.shown = list(names)
+        self.canvas.config(scrollregion=(0, 0, 0, y))
+        self.canvas.yview_moveto(0)
+
+    def selected(self):
+        """
+        Return paths to files whose checkbuttons are checked, in folder order.
+
+        :return returns list of paths.
+        """
+        return [self.files[name].file.path for name in self.order if self.files[name].var.get()]
+
+    def select_shown(self, value=1):
+        """
+        Check checkbuttons of all shown files, or uncheck checkbuttons of all files.
+
+        :param value: 1 to check, 0 to uncheck.
+        :return returns nothing.
+        """
+        for name in (self.shown if value else self.order):
+            self.files[name].var.set(value)
+
+    def neighbours(self, widget, count=NEIGHBOURS):
+        """
+        Return paths to files which are likely to be opened after file of widget: count rows after and before it
+        in shown order(nearest first), then rows visible on screen.
+
+        :param widget: 'File' widget.
+        :param count: number of rows taken on each side.
+        :return returns list of paths.
+        """
+        names = list()
+        name = widget.file.path.split(sep)[-1]
+        if name in self.shown:
+            i = self.shown.index(name)
+            for step in range(1, count + 1):
+                names.extend(self.shown[j] for j in (i + step, i - step) if 0 <= j < len(self.shown))
+        top = self.canvas.canvasy(0)
+        for item in self.canvas.find_overlapping(0, top, 1, top + self.canvas.winfo_height()):
+            if item in self.window_names and self.window_names[item] != name:
+                names.append(self.window_names[item])
+        return [self.files[el].file.path for el in dict.fromkeys(names)]
 
     def on_click(self, widget):
         """
@@ -293,15 +589,24 @@ class FileSection(Frame):
 
 class AudioFrame(ttk.Frame):
     """Widget that provide an detail image of audio tags and access to their editing"""
-    def __init__(self, parent=None, audio_path=None, style=None, **options):
+    def __init__(self, parent=None, audio_path=None, style=None, keep_backup=True, thumbnails=None, **options):
         """
         Construct a new 'AudioFrame' object using path to directory with mp3 files.
+        Edits are kept in memory and written to file with one tag write on save.
 
         :param audio_path: string with path to audio file.
+        :param keep_backup: keep tag region of file from before last save, so that save can be undone.
+        :param thumbnails: auto.thumbnails.ThumbnailCache of covers, by default thumbnails are kept in temp folder.
+        :attribute prefetcher: auto.prefetch.Prefetcher which loads tags and covers of files before they are opened.
         :return returns nothing.
         """
         ttk.Frame.__init__(self, parent, **options)
         self.style = style
+        self.thumbnails = thumbnails or auto.thumbnails.ThumbnailCache(THUMBNAILS)
+        self.prefetcher = auto.prefetch.Prefetcher(self.read_audio)
+        self.path_label = None
+        self.keep_backup = keep_backup
+        self.backup = None
         self.cur_img_path = None
         self.cur_img_type = ""
         self.canvas = None
@@ -310,8 +615,6 @@ class AudioFrame(ttk.Frame):
         self.image_name_holder = None
         self.entries = dict()
         self.audio_path = None
-        self.path_to_copy = None
-        self.prev_path_to_copy = None
         self.cur_img = None
         self.audio = None
 
@@ -349,8 +652,11 @@ class AudioFrame(ttk.Frame):
 
         :return returns nothing.
         """
-        path_label = ttk.Label(self, text=self.audio.path.split(sep)[-1], anchor=CENTER, width=10)
-        path_label.grid(row=2, column=4, columnspan=3, sticky=EW)
+        if self.path_label:
+            self.path_label.config(text=self.audio.path.split(sep)[-1])
+            return
+        self.path_label = ttk.Label(self, text=self.audio.path.split(sep)[-1], anchor=CENTER, width=10)
+        self.path_label.grid(row=2, column=4, columnspan=3, sticky=EW)
 
     def make_entries(self):
         """
@@ -441,27 +747,37 @@ class AudioFrame(ttk.Frame):
 
     def load_audio(self, audio_path):
         """
-        Load audio from path.
+        Load audio tags from path, changes are kept in memory until save.
 
         :return returns nothing.
         """
-        try:
-            remove(self.prev_path_to_copy)
-        except FileNotFoundError:
-            pass
-        except TypeError:
-            pass
-
+        if audio_path != self.audio_path:
+            self.backup = None
         self.audio_path = audio_path
-        self.path_to_copy = f'.{sep}temp{sep}copy' + sep + audio_path.split(sep)[-1].split('/')[-1]
-        self.prev_path_to_copy = self.path_to_copy
+        self.audio = self.prefetcher.take(audio_path) or SimpleMP3(audio_path, autosave=False)
+
+    def read_audio(self, audio_path):
+        """
+        Read tags of file and make thumbnail of its cover, used by prefetcher in background thread.
 
+        :param audio_path: path to audio file.
+        :return returns SimpleMP3 object which keeps changes until save.
+        """
+        audio = SimpleMP3(audio_path, autosave=False)
         try:
-            remove(self.path_to_copy)
-        except FileNotFoundError:
+            self.thumbnails.get(audio.get_img_data())
+        except (TagError, OSError):
             pass
-        copyfile(audio_path, self.path_to_copy)
-        self.audio = SimpleMP3(self.path_to_copy)
+        return audio
+
+    def prefetch(self, paths):
+        """
+        Load tags and covers of files from paths in background, so they are shown at once when they are opened.
+
+        :param paths: list of paths, most wanted first.
+        :return returns nothing.
+        """
+        self.prefetcher.request([el for el in paths if el != self.audio_path])
 
     def load_audio_img(self, type_=None):
         """
@@ -470,25 +786,19 @@ class AudioFrame(ttk.Frame):
         :return returns nothing.
         """
         try:
-            if not type_:
-                path = self.audio.get_img("./temp/open_img")
-            else:
-                path = self.audio.get_img("./temp/open_img", img=type_)
+            if type_:
                 self.cur_img_type = type_
-            img = Image.open(path)
-            img = img.convert('RGB')
-            img.thumbnail((280, 280), Image.ANTIALIAS)
+            img = self.thumbnails.get(self.audio.get_img_data(type_))
             self.cur_img = PhotoImage(image=img)
-            self.canvas.create_image(0, 0, image=self.cur_img, anchor=NW)
-            remove(path)
+            self.canvas.delete('cover')
+            self.canvas.create_image(0, 0, image=self.cur_img, anchor=NW, tag='cover')
             self.canvas.bind('<1>', (lambda event: self.command_save_img(type_=type_)))
 
-        except TagError:
-            img = Image.open(f'.{sep}images{sep}no_image.png')
-            img = img.convert('RGB')
-            img.thumbnail((280, 280), Image.ANTIALIAS)
+        except (TagError, OSError):
+            img = self.thumbnails.get_file(NO_IMAGE)
             self.cur_img = PhotoImage(image=img)
-            self.canvas.create_image(0, 0, image=self.cur_img, anchor=NW)
+            self.canvas.delete('cover')
+            self.canvas.create_image(0, 0, image=self.cur_img, anchor=NW, tag='cover')
             self.canvas.unbind('<1>')
 
     def load_audio_inf(self):
@@ -522,6 +832,8 @@ class AudioFrame(ttk.Frame):
         """
         frame = ttk.Frame(self)
         ttk.Button(frame, text='Save', command=self.command_save).pack(side=RIGHT, padx=5)
+        if self.keep_backup:
+            ttk.Button(frame, text='Undo', command=self.command_undo).pack(side=RIGHT)
         frame.grid(row=19, column=6, pady=5, sticky=EW)
 
     def command_save(self):
@@ -532,9 +844,22 @@ class AudioFrame(ttk.Frame):
         """
         for key in self.entries:
             self.audio[supported_tags[key]] = self.entries[key].get()
-        copyfile(self.path_to_copy, self.audio_path)
-        remove(self.path_to_copy)
-        self.load_audio(self.audio_path)
+        if self.keep_backup:
+            self.backup = self.audio.backup()
+        self.audio.save()
+        self.refresh()
+
+    def command_undo(self):
+        """
+        Write back tags which file had before last save.
+
+        :return returns nothing.
+        """
+        if self.backup is None:
+            showerror(title='Error occurred', message='Nothing to undo')
+            return
+        self.audio.restore(self.backup)
+        self.backup = None
         self.refresh()
 
     def command_save_as(self, path=None):
@@ -546,8 +871,7 @@ class AudioFrame(ttk.Frame):
         """
         for key in self.entries:
             self.audio[supported_tags[key]] = self.entries[key].get()
-        copyfile(self.path_to_copy, path)
-        remove(self.path_to_copy)
+        self.audio.save(path)
         self.load_audio(self.audio_path)
         self.refresh()
 
@@ -618,15 +942,217 @@ class AudioFrame(ttk.Frame):
         self.refresh()
 
 
+class BatchEditFrame(ttk.Frame):
+    """Widget that provides editing of the same tags in many files, files are edited in background thread."""
+    def __init__(self, parent=None, paths=None, **options):
+        """
+        Construct a new 'BatchEditFrame'.
+
+        :param paths: list of paths to files which should be edited.
+        :attribute stop: set to True to interrupt editing.
+        :attribute changed: list of paths to changed files, None until editing is finished.
+        :return returns nothing.
+        """
+        ttk.Frame.__init__(self, parent, **options)
+        self.paths = list(paths or [])
+        self.stop = False
+        self.done = 0
+        self.changed = None
+        self.worker = None
+        self.messages = list()
+        self.image = None
+        self.entries = dict()
+        self.clear = dict()
+        self.image_name = None
+        self.delete_images = IntVar()
+        self.progress = None
+        self.label = None
+        self.apply_button = None
+        self.closing = False
+        self.make_widget()
+        self.winfo_toplevel().protocol('WM_DELETE_WINDOW', self.command_close)
+
+    def make_widget(self):
+        """
+        Construct widget content.
+
+        :return returns nothing.
+        """
+        ttk.Label(self, text=f'{len(self.paths)} files selected, empty fields are kept', anchor=W)\
+            .grid(row=0, column=0, columnspan=3, sticky=EW, padx=3, pady=5)
+        row = 1
+        for key in supported_tags:
+            if key == 'APIC':
+                break
+            ttk.Label(self, text=supported_tags[key][0].upper() + supported_tags[key][1:], width=8)\
+                .grid(row=row, column=0, sticky=W, padx=3)
+            entry = ttk.Entry(self, width=34)
+            entry.grid(row=row, column=1, sticky=EW, padx=3, pady=2)
+            self.clear[key] = IntVar()
+            ttk.Checkbutton(self, text='Clear', variable=self.clear[key], takefocus=False)\
+                .grid(row=row, column=2, sticky=W, padx=3)
+            self.entries[key] = entry
+            row += 1
+
+        ttk.Label(self, text='APIC', width=8).grid(row=row, column=0, sticky=W, padx=3)
+        self.image_name = ttk.Entry(self, width=34)
+        self.image_name.grid(row=row, column=1, sticky=EW, padx=3, pady=2)
+        ttk.Button(self, text='File', command=self.command_ask_image).grid(row=row, column=2, sticky=W, padx=3)
+        row += 1
+        ttk.Checkbutton(self, text='Delete all APIC', variable=self.delete_images, takefocus=False)\
+            .grid(row=row, column=1, sticky=W, padx=3)
+        row += 1
+
+        self.progress = ttk.Progressbar(self, maximum=max(len(self.paths), 1))
+        self.progress.grid(row=row, column=0, columnspan=3, sticky=EW, padx=3, pady=5)
+        row += 1
+        self.label = ttk.Label(self, text='', anchor=W)
+        self.label.grid(row=row, column=0, columnspan=2, sticky=EW, padx=3)
+
+        buttons = ttk.Frame(self)
+        buttons.grid(row=row + 1, column=0, columnspan=3, sticky=E, padx=3, pady=5)
+        ttk.Button(buttons, text='Cancel', command=self.command_cancel).pack(side=RIGHT)
+        self.apply_button = ttk.Button(buttons, text='Apply', command=self.command_apply)
+        self.apply_button.pack(side=RIGHT, padx=3)
+        self.columnconfigure(1, weight=1)
+
+    def command_ask_image(self):
+        """
+        Ask for image file which is set to every file.
+
+        :return returns nothing.
+        """
+        self.image = askopenfilename(title='Select image file') or None
+        if self.image:
+            self.label.config(text=self.image.split('/')[-1].split(sep)[-1])
+
+    def command_apply(self):
+        """
+        Start editing files in background thread.
+
+        :return returns nothing.
+        """
+        tags = dict()
+        clear = list()
+        for key in self.entries:
+            if self.clear[key].get():
+                clear.append(supported_tags[key])
+            elif self.entries[key].get():
+                tags[supported_tags[key]] = self.entries[key].get()
+        if not (tags or clear or self.image or self.delete_images.get()):
+            showerror(title='Error occurred', message='Nothing to change')
+            return
+        self.apply_button['state'] = 'disable'
+        self.worker = Thread(target=self.run, args=(tags, clear, self.image_name.get(), bool(self.delete_images.get())),
+                             daemon=True)
+        self.worker.start()
+        self.poll()
+
+    def run(self, tags, clear, image_name, delete_images):
+        """
+        Edit files, called in background thread.  Values of widgets are read by command_apply, Tk isn't thread-safe.
+
+        :param tags: dict of tags which are set.
+        :param clear: list of tags which are cleared.
+        :param image_name: name of APIC which is set.
+        :param delete_images: delete all APIC first.
+        :return returns nothing.
+        """
+        self.changed = auto.batch.batch_edit(self.paths, tags=tags, clear=clear, image=self.image,
+                                             image_name=image_name, delete_images=delete_images, parent=self,
+                                             progress=self.set_progress, file=self)
+
+    def set_progress(self, done, total):
+        """
+        Remember number of edited files, called in background thread.
+
+        :return returns nothing.
+        """
+        self.done = done
+
+    def write(self, text):
+        """
+        File-like method, keep messages of editing.
+
+        :param text: text which should be written.
+        :return returns nothing.
+        """
+        if text.strip():
+            self.messages.append(text)
+
+    def poll(self):
+        """
+        Show progress of background editing, call on_done when it's finished.
+
+        :return returns nothing.
+        """
+        self.progress['value'] = self.done
+        errors = sum(1 for el in self.messages if el.startswith('[Error]'))
+        text = f'{self.done} / {len(self.paths)}'
+        if errors:
+            text += f', {errors} errors'
+        self.label.config(text=text)
+        if self.worker.is_alive():
+            self.after(100, self.poll)
+            return
+        if self.closing:
+            self.on_done(self.changed or [])
+            self.winfo_toplevel().destroy()
+            return
+        if self.messages:
+            text = self.messages[-1].replace('[Info]', '')
+            if errors:
+                text += f' {errors} errors.'
+            self.label.config(text=text)
+        self.on_done(self.changed or [])
+
+    def command_cancel(self):
+        """
+        Stop editing if it's running, otherwise close window.
+
+        :return returns nothing.
+        """
+        if self.worker and self.worker.is_alive():
+            self.stop = True
+        else:
+            self.winfo_toplevel().destroy()
+
+    def command_close(self):
+        """
+        Close window, running editing is stopped first and window is closed by poll when worker is finished.
+
+        :return returns nothing.
+        """
+        if self.worker and self.worker.is_alive():
+            self.stop = True
+            self.closing = True
+            self.label.config(text='Stopping...')
+        else:
+            self.winfo_toplevel().destroy()
+
+    def on_done(self, changed):
+        """
+        Called when editing is finished, need to be overriden.
+
+        :param changed: list of paths to changed files.
+        :return returns nothing.
+        """
+        pass
+
+
 class AutoTaggerFrame(ttk.Frame):
     """Widget that provides an interface to auto tagger and its components"""
-    def __init__(self, parent=None, iap=None, aap=None, blp=None, cur_dir=None, style='Tagger', **options):
+    def __init__(self, parent=None, iap=None, aap=None, blp=None, cur_dir=None, style='Tagger', tp=None, dbp=None,
+                 cp=None, **options):
         """
         Construct a new 'AutoTaggerFrame'.
 
         :param iap: path to image associations file.
         :param aap: path to album associations file.
         :param blp: path to list of banned words/symbols file.
+        :param tp: path to list of filename templates file.
+        :param dbp: path to SQLite database with associations, pickle files are used when it's None.
+        :param cp: path to SQLite library catalog which is kept up to date with tagged files.
         :param audio_path: string with path to audio file.
         :return returns nothing.
         """
@@ -635,22 +1161,31 @@ class AutoTaggerFrame(ttk.Frame):
         self.image_associations_path = iap
         self.album_associations_path = aap
         self.ban_list_path = blp
+        self.templates_path = tp
+        self.database_path = dbp
+        self.catalog_path = cp
         self.cur_dir = cur_dir
         self.buttons_holder = None
-        self.stop = None
         self.field = None
         self.row_num = None
         self.auto_tagger = None
         self.start_button = None
         self.stop_button = None
+        self.pause_button = None
+        self.process = None
+        self.changed = None
+        self.task = None
+        self.task_events = None
 
         self.vars = dict()
         self.vars['Title'] = IntVar()
         self.vars['Artist'] = IntVar()
         self.vars['Image'] = IntVar()
         self.vars['Album'] = IntVar()
+        self.work_list = StringVar(value='Folder')
 
         self.make_widget()
+        self.winfo_toplevel().protocol('WM_DELETE_WINDOW', self.command_close)
 
     def make_widget(self):
         """
@@ -730,6 +1265,8 @@ class AutoTaggerFrame(ttk.Frame):
             self.make_album_menu(self.buttons_holder)
         elif module == 'image':
             self.make_image_menu(self.buttons_holder)
+        if self.task:
+            self.set_controls_state('disable')
 
     def make_tagger_menu(self, holder):
         """
@@ -757,6 +1294,13 @@ class AutoTaggerFrame(ttk.Frame):
 
         ttk.Frame(holder, height=6, style=self.style + '.Left.TFrame').pack(side=TOP, fill=Y)
 
+        ttk.Label(holder, text="Work list", anchor=CENTER, style=self.style + '.Left.TLabel') \
+            .pack(side=TOP, fill=X)
+        ttk.Combobox(holder, textvariable=self.work_list, values=list(WORK_LISTS), state='readonly', width=17,
+                     takefocus=False).pack(side=TOP, fill=X, pady=2)
+
+        ttk.Frame(holder, height=6, style=self.style + '.Left.TFrame').pack(side=TOP, fill=Y)
+
     def make_album_menu(self, holder):
         """
         Construct menu for album module.
@@ -773,14 +1317,20 @@ class AutoTaggerFrame(ttk.Frame):
             .pack(side=TOP, fill=X, pady=2)
         ttk.Button(holder, text='Associate', command=(lambda: self.command_associate('album'))) \
             .pack(side=TOP, fill=X)
-        ttk.Button(holder, text='Delete', command=(lambda: self.command_del_association('album'))) \
+        ttk.Button(holder, text='Harvest', command=self.command_harvest) \
             .pack(side=TOP, fill=X, pady=2)
-        ttk.Button(holder, text='Show', command=(lambda: self.command_show('album'))) \
+        ttk.Button(holder, text='Delete', command=(lambda: self.command_del_association('album'))) \
             .pack(side=TOP, fill=X)
+        ttk.Button(holder, text='Show', command=(lambda: self.command_show('album'))) \
+            .pack(side=TOP, fill=X, pady=2)
         ttk.Button(holder, text='Update', command=(lambda: self.command_update('album'))) \
+            .pack(side=TOP, fill=X)
+        ttk.Button(holder, text='Import', command=(lambda: self.command_import('album'))) \
             .pack(side=TOP, fill=X, pady=2)
-        ttk.Button(holder, text='Clear', command=(lambda: self.command_clear('album'))) \
+        ttk.Button(holder, text='Export', command=(lambda: self.command_export('album'))) \
             .pack(side=TOP, fill=X)
+        ttk.Button(holder, text='Clear', command=(lambda: self.command_clear('album'))) \
+            .pack(side=TOP, fill=X, pady=2)
         ttk.Button(holder, text='Save', width=20, command=(lambda: self.command_save('album'))) \
             .pack(side=TOP, fill=X)
 
@@ -802,13 +1352,21 @@ class AutoTaggerFrame(ttk.Frame):
             .pack(side=TOP, fill=X, pady=2)
         ttk.Button(holder, text='Associate', command=(lambda: self.command_associate('img'))) \
             .pack(side=TOP, fill=X)
-        ttk.Button(holder, text='Delete', command=(lambda: self.command_del_association('img'))) \
+        ttk.Button(holder, text='Dedupe', command=self.command_dedupe_images) \
             .pack(side=TOP, fill=X, pady=2)
-        ttk.Button(holder, text='Show', command=(lambda: self.command_show('img'))) \
+        ttk.Button(holder, text='Delete', command=(lambda: self.command_del_association('img'))) \
             .pack(side=TOP, fill=X)
+        ttk.Button(holder, text='Show', command=(lambda: self.command_show('img'))) \
+            .pack(side=TOP, fill=X, pady=2)
         ttk.Button(holder, text='Update', command=(lambda: self.command_update('img'))) \
+            .pack(side=TOP, fill=X)
+        ttk.Button(holder, text='Import', command=(lambda: self.command_import('img'))) \
             .pack(side=TOP, fill=X, pady=2)
+        ttk.Button(holder, text='Export', command=(lambda: self.command_export('img'))) \
+            .pack(side=TOP, fill=X)
         ttk.Button(holder, text='Clear', command=(lambda: self.command_clear('img'))) \
+            .pack(side=TOP, fill=X, pady=2)
+        ttk.Button(holder, text='Export covers', command=self.command_export_covers) \
             .pack(side=TOP, fill=X)
         ttk.Button(holder, text='Save', width=20, command=(lambda: self.command_save('img'))) \
             .pack(side=TOP, fill=X)
@@ -841,49 +1399,106 @@ class AutoTaggerFrame(ttk.Frame):
         self.row_num = 2
 
         self.auto_tagger = tagger.AutoTagger(self.ban_list_path, self.image_associations_path,
-                                             self.album_associations_path, file=self)
+                                             self.album_associations_path, file=self, templates=self.templates_path,
+                                             database=self.database_path, catalog=self.catalog_path)
         bar = ttk.Frame(holder)
         bar.pack(side=TOP, pady=12, fill=X)
         ttk.Frame(bar, width=20).pack(side=RIGHT)
 
         self.start_button = ttk.Button(bar, text='Start', width=10, command=self.command_start_tagging)
+        self.pause_button = ttk.Button(bar, text='Pause', width=10, command=self.command_pause)
         self.stop_button = ttk.Button(bar, text='Stop', width=10, command=self.command_stop)
         self.stop_button.pack(side=RIGHT)
+        self.pause_button.pack(side=RIGHT)
         self.start_button.pack(side=RIGHT)
 
     def command_start_tagging(self):
         """
-        Run auto tagger.
+        Run auto tagger in child process, its output is read by poll_tagging.
 
         :return returns nothing.
         """
-        self.stop = False
         self.start_button['state'] = 'disable'
         self.field.delete('1.0', END)
         self.row_num = 2
-        thread = Thread(target=self.command_auto_tag, args=(self.cur_dir,),
-                        kwargs={'parent': self})
-        thread.start()
+        self.changed = None
+
+        query = WORK_LISTS.get(self.work_list.get())
+        since = None
+        if query == 'changed-since':
+            since = time.mktime(time.localtime()[:3] + (0, 0, 0, 0, 0, -1))
+        replaces = {key: self.vars[key].get() for key in self.vars}
+        self.process = auto.worker.TaggingProcess(self.auto_tagger.tagging_state(), self.cur_dir, replaces=replaces,
+                                                  query=query, since=since)
+        self.process.start()
+        self.poll_tagging()
+
+    def poll_tagging(self):
+        """
+        Write output of tagging process to field, call on_tagged when it's finished.
+
+        :return returns nothing.
+        """
+        for event in self.process.poll():
+            if event[0] == 'write':
+                self.write(event[1])
+            elif event[0] == 'failed':
+                self.write('[ErrorCodeRed]Error: ' + event[1])
+            elif event[0] == 'done':
+                self.changed = event[1]
+        if not self.process.is_finished():
+            self.after(50, self.poll_tagging)
+            return
+        self.process = None
+        self.start_button['state'] = 'disable' if self.task else 'normal'
+        self.pause_button['text'] = 'Pause'
+        self.on_tagged(self.changed or [])
 
     def command_stop(self):
         """
-        Stop auto tagger.
+        Stop auto tagger after current file.
 
         :return returns nothing.
         """
-        self.stop = True
-        self.start_button['state'] = 'normal'
+        if self.process:
+            self.process.stop()
+            self.pause_button['text'] = 'Pause'
 
-    def command_auto_tag(self, path, parent=None):
+    def command_close(self):
         """
-        Auto tagging command.
+        Close window, running auto tagger is stopped after current file and waited for, so no file is left half written.
 
-        :param path: target path for auto tagger.
-        :param parent: object which have an stop attribut used to stop tagging.
         :return returns nothing.
         """
-        self.auto_tagger.auto_tag(path, replaces=self.vars, parent=parent)
-        self.start_button['state'] = 'normal'
+        if self.process:
+            self.process.stop()
+            self.process.join()
+            self.process = None
+        self.winfo_toplevel().destroy()
+
+    def command_pause(self):
+        """
+        Pause auto tagger after current file or resume it.
+
+        :return returns nothing.
+        """
+        if not self.process:
+            return
+        if self.process.is_paused():
+            self.process.resume()
+            self.pause_button['text'] = 'Pause'
+        else:
+            self.process.pause()
+            self.pause_button['text'] = 'Resume'
+
+    def on_tagged(self, changed):
+        """
+        Called when auto tagging is finished or stopped, need to be overriden.
+
+        :param changed: list of paths to files which were changed.
+        :return returns nothing.
+        """
+        pass
 
     def write(self, text):
         """
@@ -918,7 +1533,7 @@ class AutoTaggerFrame(ttk.Frame):
 
         self.row_num += 1
         self.field.see(END)
-        self.field.update()
+        self.field.update_idletasks()
 
     def writelines(self, lines):
         """
@@ -1049,6 +1664,103 @@ class AutoTaggerFrame(ttk.Frame):
             win.grab_set()
             win.wait_window()
 
+    def command_harvest(self):
+        """
+        Learn album associations from album tags of all files in chosen directory and its subdirectories.
+
+        :return returns nothing.
+        """
+        path = askdirectory()
+        if path:
+            self.run_task(self.auto_tagger.harvest, path)
+
+    def command_dedupe_images(self):
+        """
+        Point image associations to the best copy of each cover found more than once in chosen directory.
+
+        :return returns nothing.
+        """
+        path = askdirectory(title='Chose images folder')
+        if path:
+            self.run_task(self.auto_tagger.dedupe_images, path)
+
+    def command_export_covers(self):
+        """
+        Write every distinct cover embedded in files from chosen library folder to chosen folder.
+
+        :return returns nothing.
+        """
+        path = askdirectory(title='Chose library folder')
+        if not path:
+            return
+        destination = askdirectory(title='Chose covers folder')
+        if destination:
+            self.run_task(self.auto_tagger.export_covers, path, destination)
+
+    def run_task(self, function, *args):
+        """
+        Run auto tagger method in background thread, its output is written to field by poll_task.
+
+        :param function: method of auto tagger.
+        :return returns nothing.
+        """
+        if self.task:
+            print('[Error]Another task is running.', file=self)
+            return
+        self.task_events = queue.Queue()
+        self.auto_tagger.file = auto.worker.QueueWriter(self.task_events)
+        self.task = Thread(target=self.work_task, args=(function, args), daemon=True)
+        self.set_controls_state('disable')
+        self.task.start()
+        self.poll_task()
+
+    def set_controls_state(self, state):
+        """
+        Set state of association buttons and Start button, they are disabled while background task uses associations.
+
+        :param state: 'disable' or 'normal'.
+        :return returns nothing.
+        """
+        for widget in self.buttons_holder.winfo_children():
+            if isinstance(widget, ttk.Button):
+                widget['state'] = state
+        if not self.process:
+            self.start_button['state'] = state
+
+    def work_task(self, function, args):
+        """
+        Call function in background thread and report its end.
+
+        :return returns nothing.
+        """
+        try:
+            function(*args)
+        except Exception as e:
+            self.task_events.put(('failed', '{}: {}'.format(type(e).__name__, e)))
+        self.task_events.put(('done', None))
+
+    def poll_task(self):
+        """
+        Write output of background task to field until it's finished.
+
+        :return returns nothing.
+        """
+        for i in range(auto.worker.POLL_LIMIT):
+            try:
+                event = self.task_events.get_nowait()
+            except queue.Empty:
+                break
+            if event[0] == 'write':
+                self.write(event[1])
+            elif event[0] == 'failed':
+                self.write('[ErrorCodeRed]Error: ' + event[1])
+            elif event[0] == 'done':
+                self.auto_tagger.file = self
+                self.task = None
+                self.set_controls_state('normal')
+                return
+        self.after(50, self.poll_task)
+
     def command_del_association(self, assoc_type):
         """
         Delete association association.
@@ -1172,6 +1884,30 @@ class AutoTaggerFrame(ttk.Frame):
         finally:
             pass
 
+    def command_import(self, assoc_type):
+        """
+        Merge associations from CSV or JSON lines file.
+
+        :param assoc_type: type of association.
+        :return returns nothing.
+        """
+        path = askopenfilename(title='Chose import file',
+                               filetypes=[('CSV', '*.csv'), ('JSON lines', '*.jsonl'), ('All files', '*')])
+        if path:
+            self.run_task(self.auto_tagger.import_associations, assoc_type, path)
+
+    def command_export(self, assoc_type):
+        """
+        Write associations to CSV or JSON lines file.
+
+        :param assoc_type: type of association.
+        :return returns nothing.
+        """
+        path = asksaveasfilename(title='Chose export file', defaultextension='.csv',
+                                 filetypes=[('CSV', '*.csv'), ('JSON lines', '*.jsonl')])
+        if path:
+            self.auto_tagger.export_associations(assoc_type, path)
+
     def command_clear(self, assoc_type):
         """
         Clear associations.
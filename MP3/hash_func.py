@@ -1,5 +1,9 @@
 import hashlib
 
+
+HEAD_SIZE = 64 * 1024
+
+
 def file_sha256(file_path):
     h = hashlib.sha256()
 
@@ -11,3 +15,9 @@ def file_sha256(file_path):
             h.update(chunk)
 
     return h.hexdigest()
+
+
+def file_head_sha256(file_path, size=HEAD_SIZE):
+    """Return sha256 of first size bytes of file, cheap pre-check before hashing whole file."""
+    with open(file_path, 'rb') as file:
+        return hashlib.sha256(file.read(size)).hexdigest()
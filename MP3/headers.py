@@ -0,0 +1,342 @@
+"""Module implement cheap reading of MPEG audio properties straight from file headers.
+
+Only ID3v2 header, first MPEG frame header and Xing/Info/VBRI header are read, so duration, bitrate and sample rate
+are got in a few seeks whatever the file size.  Files without VBR header are checked by sampling a bounded number of
+frames, if their bitrates differ duration is estimated from their average.
+
+read_text_frames reads chosen ID3v2 text frames walking frame headers, bodies of other frames(pictures above all)
+are skipped without reading.  Frames which can't be read that way are read by mutagen.
+"""
+
+
+from mutagen import MutagenError
+from mutagen.id3 import ID3
+import os
+import struct
+
+
+BITRATES = {
+    (1, 1): (0, 32, 64, 96, 128, 160, 192, 224, 256, 288, 320, 352, 384, 416, 448),
+    (1, 2): (0, 32, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320, 384),
+    (1, 3): (0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320),
+    (2, 1): (0, 32, 48, 56, 64, 80, 96, 112, 128, 144, 160, 176, 192, 224, 256),
+    (2, 2): (0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160),
+    (2, 3): (0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160),
+}
+
+SAMPLE_RATES = {1: (44100, 48000, 32000), 2: (22050, 24000, 16000), 2.5: (11025, 12000, 8000)}
+
+VERSIONS = {0: 2.5, 2: 2, 3: 1}
+
+TEXT_ENCODINGS = {0: "latin1", 1: "utf16", 2: "utf-16-be", 3: "utf8"}
+
+V22_FRAMES = {"TT2": "TIT2", "TP1": "TPE1", "TAL": "TALB", "TRK": "TRCK", "TYE": "TDRC"}
+
+SEARCH_LIMIT = 64 * 1024
+SAMPLE_POINTS = 3
+SAMPLE_FRAMES = 8
+
+
+class FrameHeader:
+    """Decoded 4 bytes MPEG audio frame header."""
+    def __init__(self, data):
+        """
+        Construct a new 'FrameHeader' object.
+
+        :param data: 4 bytes of header.
+        :return returns nothing.
+        """
+        value = struct.unpack(">I", data)[0]
+        if value >> 21 != 0x7FF:
+            raise HeaderError("No frame sync")
+        version_bits = (value >> 19) & 3
+        layer_bits = (value >> 17) & 3
+        bitrate_index = (value >> 12) & 15
+        sample_rate_index = (value >> 10) & 3
+        if version_bits == 1 or layer_bits == 0 or bitrate_index in (0, 15) or sample_rate_index == 3:
+            raise HeaderError("Bad frame header")
+
+        self.version = VERSIONS[version_bits]
+        self.layer = 4 - layer_bits
+        self.protected = not (value >> 16) & 1
+        self.bitrate = BITRATES[(min(self.version, 2), self.layer)][bitrate_index] * 1000
+        self.sample_rate = SAMPLE_RATES[self.version][sample_rate_index]
+        self.padding = (value >> 9) & 1
+        self.mode = (value >> 6) & 3
+        self.channels = 1 if self.mode == 3 else 2
+
+        if self.layer == 1:
+            self.samples = 384
+            self.length = (12 * self.bitrate // self.sample_rate + self.padding) * 4
+        elif self.layer == 2 or self.version == 1:
+            self.samples = 1152
+            self.length = 144 * self.bitrate // self.sample_rate + self.padding
+        else:
+            self.samples = 576
+            self.length = 72 * self.bitrate // self.sample_rate + self.padding
+
+    def side_info_size(self):
+        """Return size of layer 3 side information, Xing header is placed right after it."""
+        if self.version == 1:
+            size = 17 if self.channels == 1 else 32
+        else:
+            size = 9 if self.channels == 1 else 17
+        return size + (2 if self.protected else 0)
+
+
+class MPEGInfo:
+    """Audio properties of mp3 file.
+
+    duration is in seconds, bitrate in bits per second.  vbr is True for variable bitrate files, estimated is True
+    when duration isn't exact because file has variable bitrate and no VBR header.
+    """
+    def __init__(self, header, duration, bitrate, vbr=False, frames=None, estimated=False):
+        self.version = header.version
+        self.layer = header.layer
+        self.sample_rate = header.sample_rate
+        self.channels = header.channels
+        self.duration = duration
+        self.bitrate = bitrate
+        self.vbr = vbr
+        self.frames = frames
+        self.estimated = estimated
+
+    def __repr__(self):
+        return "MPEGInfo(duration={:.2f}, bitrate={}, sample_rate={}, vbr={})".format(
+            self.duration, self.bitrate, self.sample_rate, self.vbr)
+
+
+def id3_size(file):
+    """Return size of ID3v2 tag (with header and footer) at the beginning of opened file, 0 if there is no tag."""
+    file.seek(0)
+    header = file.read(10)
+    if len(header) < 10 or not header.startswith(b"ID3"):
+        return 0
+    size = _syncsafe(header[6:10]) + 10
+    if header[5] & 0x10:
+        size += 10
+    return size
+
+
+def read_text_frames(path, frames=("TPE1", "TIT2", "TALB")):
+    """Return dict {frame id: text} of text frames from ID3v2 tag of file in path.
+
+    Multiple values are joined with null character like mutagen does, ID3v2.2 frame ids are translated to ID3v2.3
+    ones.  If some of frames isn't found by walking frame headers(e.g. it's compressed, or whole ID3v2.3 tag is
+    unsynchronised) the tag is read by mutagen, frames which are absent there too are left out.
+    """
+    res = _walk_text_frames(path, frames)
+    if len(res) < len(frames):
+        try:
+            tag = ID3(path)
+        except MutagenError:
+            return res
+        for frame_id in frames:
+            if frame_id not in res and frame_id in tag:
+                res[frame_id] = str(tag[frame_id])
+    return res
+
+
+def _walk_text_frames(path, frames):
+    """Return dict {frame id: text} of text frames which can be read walking frame headers, see read_text_frames."""
+    res = dict()
+    with open(path, "rb") as file:
+        header = file.read(10)
+        if len(header) < 10 or not header.startswith(b"ID3"):
+            return res
+        version, flags = header[3], header[5]
+        if version not in (2, 3, 4) or (flags & 0x80 and version < 4):
+            return res
+        end = 10 + _syncsafe(header[6:10])
+        pos = 10
+        if flags & 0x40 and version > 2:
+            ext = file.read(4)
+            pos += _syncsafe(ext) if version == 4 else 4 + struct.unpack(">I", ext)[0]
+
+        header_size = 6 if version == 2 else 10
+        while pos + header_size <= end and len(res) < len(frames):
+            file.seek(pos)
+            frame_header = file.read(header_size)
+            if len(frame_header) < header_size or frame_header[0] == 0:
+                break
+            if version == 2:
+                frame_id = V22_FRAMES.get(frame_header[:3].decode("latin1"), "")
+                size = int.from_bytes(frame_header[3:6], "big")
+                frame_flags = 0
+            else:
+                frame_id = frame_header[:4].decode("latin1")
+                size = _syncsafe(frame_header[4:8]) if version == 4 else struct.unpack(">I", frame_header[4:8])[0]
+                frame_flags = struct.unpack(">H", frame_header[8:10])[0]
+            pos += header_size + size
+            if frame_id not in frames or frame_id in res:
+                continue
+
+            data = file.read(size)
+            if version == 4:
+                if frame_flags & 0x000C:
+                    continue
+                if frame_flags & 0x0040:
+                    data = data[1:]
+                if frame_flags & 0x0002 or flags & 0x80:
+                    data = data.replace(b"\xff\x00", b"\xff")
+                if frame_flags & 0x0001:
+                    data = data[4:]
+            elif version == 3:
+                if frame_flags & 0x00C0:
+                    continue
+                if frame_flags & 0x0020:
+                    data = data[1:]
+            text = _decode_text(data)
+            if text is not None:
+                res[frame_id] = text
+    return res
+
+
+def _syncsafe(data):
+    size = 0
+    for byte in data:
+        size = (size << 7) | (byte & 0x7F)
+    return size
+
+
+def _decode_text(data):
+    """Return text of text frame body or None if it has unknown encoding."""
+    if not data or data[0] not in TEXT_ENCODINGS:
+        return None
+    encoding = TEXT_ENCODINGS[data[0]]
+    if data[0] in (1, 2):
+        values = list()
+        start = 1
+        for i in range(1, len(data) - 1, 2):
+            if data[i:i + 2] == b"\0\0":
+                values.append(data[start:i])
+                start = i + 2
+        values.append(data[start:])
+    else:
+        values = data[1:].split(b"\0")
+    try:
+        text = "\0".join(value.decode(encoding) for value in values)
+    except UnicodeDecodeError:
+        return None
+    return text.rstrip("\0")
+
+
+def read_info(path):
+    """Return MPEGInfo of mp3 file from path.
+
+    Raise HeaderError when no valid MPEG frame is found.
+    """
+    with open(path, "rb") as file:
+        file_size = os.fstat(file.fileno()).st_size
+        start = id3_size(file)
+        offset, header = find_frame(file, start)
+
+        end = file_size
+        if file_size >= 128:
+            file.seek(file_size - 128)
+            if file.read(3) == b"TAG":
+                end -= 128
+        audio_size = max(end - offset, 0)
+
+        file.seek(offset)
+        frame = file.read(max(header.length, 4 + 36 + 18))
+        info = _read_vbr_header(header, frame, audio_size)
+        if info:
+            return info
+
+        bitrate, vbr = _sample_bitrate(file, header, offset, end)
+        duration = audio_size * 8 / bitrate
+        return MPEGInfo(header, duration, bitrate, vbr=vbr, estimated=vbr)
+
+
+def find_frame(file, start, limit=SEARCH_LIMIT):
+    """Return (offset, FrameHeader) of first valid frame after start.
+
+    Frame is accepted only if the next frame header is valid too, it cuts down false syncs in garbage data.
+    """
+    file.seek(start)
+    data = file.read(limit)
+    pos = data.find(b"\xff")
+    while 0 <= pos <= len(data) - 4:
+        try:
+            header = FrameHeader(data[pos:pos + 4])
+        except HeaderError:
+            pos = data.find(b"\xff", pos + 1)
+            continue
+        following = pos + header.length
+        if following + 4 > len(data):
+            file.seek(start + following)
+            next_data = file.read(4)
+        else:
+            next_data = data[following:following + 4]
+        try:
+            if len(next_data) == 4:
+                FrameHeader(next_data)
+            return start + pos, header
+        except HeaderError:
+            pos = data.find(b"\xff", pos + 1)
+    raise HeaderError("No MPEG frame found")
+
+
+def _read_vbr_header(header, frame, audio_size):
+    """Return MPEGInfo from Xing/Info or VBRI header in first frame, None if frame has no such header."""
+    offset = 4 + header.side_info_size()
+    tag = frame[offset:offset + 4]
+    if tag in (b"Xing", b"Info") and len(frame) >= offset + 8:
+        flags = struct.unpack(">I", frame[offset + 4:offset + 8])[0]
+        pos = offset + 8
+        frames = None
+        size = None
+        if flags & 1:
+            frames = struct.unpack(">I", frame[pos:pos + 4])[0]
+            pos += 4
+        if flags & 2:
+            size = struct.unpack(">I", frame[pos:pos + 4])[0]
+        if not frames:
+            return None
+        duration = frames * header.samples / header.sample_rate
+        size = size or audio_size
+        bitrate = int(size * 8 / duration) if duration else header.bitrate
+        return MPEGInfo(header, duration, bitrate, vbr=tag == b"Xing", frames=frames)
+
+    offset = 4 + 32
+    if frame[offset:offset + 4] == b"VBRI" and len(frame) >= offset + 18:
+        size, frames = struct.unpack(">II", frame[offset + 10:offset + 18])
+        if not frames:
+            return None
+        duration = frames * header.samples / header.sample_rate
+        bitrate = int(size * 8 / duration) if duration else header.bitrate
+        return MPEGInfo(header, duration, bitrate, vbr=True, frames=frames)
+    return None
+
+
+def _sample_bitrate(file, header, offset, end):
+    """Return (average bitrate, is variable) got from a bounded number of frames at a few points of file."""
+    bitrates = list()
+    span = end - offset
+    points = [offset] + [offset + span * i // (SAMPLE_POINTS + 1) for i in range(1, SAMPLE_POINTS + 1)]
+    for point in points:
+        try:
+            pos, frame = find_frame(file, point, limit=4096)
+        except HeaderError:
+            continue
+        for i in range(SAMPLE_FRAMES):
+            bitrates.append(frame.bitrate)
+            pos += frame.length
+            if pos + 4 > end:
+                break
+            file.seek(pos)
+            try:
+                frame = FrameHeader(file.read(4))
+            except HeaderError:
+                break
+    if not bitrates:
+        return header.bitrate, False
+    vbr = any(el != bitrates[0] for el in bitrates)
+    return sum(bitrates) // len(bitrates), vbr
+
+
+class HeaderError(Exception):
+    """Error that is raised when file has no valid MPEG headers."""
+    def __init__(self, value):
+        self.value = value
@@ -1,12 +1,18 @@
 """Module implement SimpleMP3 class to simplify use of mutagen ID3 class.
 supported_tags is a dict with ID3 tags as keys and their SimpleMP3 synonyms as values.
+
+SimpleMP3 made with autosave=False keeps changes in memory until save is called, so any number of edits costs one
+tag write.  backup returns raw bytes of ID3v2 tag region of file(audio isn't read), restore writes them back.
 """
 
 
 from mutagen.id3 import ID3, TIT2, TALB, TPE1, APIC, TRCK, TDRC, ID3NoHeaderError
 import MP3.hash_func
+import MP3.headers
 import filetype
+import shutil
 import os.path
+import os
 
 
 supported_tags = {"TIT2": "title", "TPE1": "artist", "TALB": "album", "TDRC": "year",
@@ -17,15 +23,19 @@ class SimpleMP3:
     """
     Provide an easy access to tags and hash function
     """
-    def __init__(self, path):
+    def __init__(self, path, autosave=True):
         """
         Construct a new 'SimpleMP3' object.
         Load associations dicts and ban list from given path, when files not founded use empty dicts and list.
 
         :param path: path to file.
+        :param autosave: write file after every change, otherwise changes are kept until save is called.
         :return returns nothing.
         """
         self.path = path
+        self.info = None
+        self.autosave = autosave
+        self.changed = False
         if path.endswith(".mp3"):
             try:
                 self.audio = ID3(path)
@@ -35,34 +45,102 @@ class SimpleMP3:
             raise FormatError("Not supported extension")
 
     def __setitem__(self, k, val):
+        self._set(k, val)
+        self._commit()
+
+    def _commit(self):
+        """Write tags if autosave is on, otherwise remember that there are unsaved changes."""
+        if self.autosave:
+            self.audio.save(self.path)
+        else:
+            self.changed = True
+
+    def save(self, path=None):
+        """Write tags to file in one write.
+
+        :param path: path to other file, audio is copied there and tags are written to the copy.
+        :return returns nothing.
+        """
+        if path and os.path.abspath(path) != os.path.abspath(self.path):
+            shutil.copyfile(self.path, path)
+            self.audio.save(path)
+            return
+        self.audio.save(self.path)
+        self.changed = False
+
+    def backup(self):
+        """Return bytes of ID3v2 tag region of file as it is on disk, b'' if file has no tag."""
+        with open(self.path, "rb") as file:
+            size = MP3.headers.id3_size(file)
+            file.seek(0)
+            return file.read(size)
+
+    def restore(self, data):
+        """Put tag region got from backup in place of current tag region of file, unsaved changes are dropped.
+
+        Bytes are written back as they were, so tag keeps its version and padding.  If both regions have the same
+        size they are overwritten in place, otherwise file is rewritten through temporary file.
+
+        :param data: bytes returned by backup.
+        :return returns nothing.
+        """
+        with open(self.path, "r+b") as file:
+            size = MP3.headers.id3_size(file)
+            if size == len(data):
+                file.seek(0)
+                file.write(data)
+            else:
+                temp = self.path + ".tmp"
+                with open(temp, "wb") as out:
+                    out.write(data)
+                    file.seek(size)
+                    shutil.copyfileobj(file, out)
+        if size != len(data):
+            os.replace(temp, self.path)
+        try:
+            self.audio = ID3(self.path)
+        except ID3NoHeaderError:
+            self.audio = ID3()
+        self.info = None
+        self.changed = False
+
+    def _set(self, k, val):
+        """Set tag in memory without saving file."""
         if k == "title":
             if val is None:
                 val = ""
             self.audio["TIT2"] = TIT2(encoding=3, text=val)
-            self.audio.save(self.path)
         elif k == "artist":
             if val is None:
                 val = ""
             self.audio["TPE1"] = TPE1(encoding=3, text=val)
-            self.audio.save(self.path)
         elif k == "album":
             if val is None:
                 val = ""
             self.audio["TALB"] = TALB(encoding=3, text=val)
-            self.audio.save(self.path)
         elif k == "year":
             if val is None:
                 val = ""
             self.audio["TDRC"] = TDRC(encoding=3, text=val)
-            self.audio.save(self.path)
         elif k == "number":
             if val is None:
                 val = ""
             self.audio["TRCK"] = TRCK(encoding=3, text=val)
-            self.audio.save(self.path)
         else:
             raise TagError("Tag {} not supported".format(k))
 
+    def update(self, tags):
+        """Set several tags and save file once.
+
+        :param tags: dict with SimpleMP3 tag synonyms as keys.
+        :return returns nothing.
+        """
+        if not tags:
+            return
+        for k in tags:
+            self._set(k, tags[k])
+        self._commit()
+
     def __getitem__(self, k):
         try:
             if k == "title":
@@ -97,6 +175,22 @@ class SimpleMP3:
         """Return sha256 of file."""
         return MP3.hash_func.file_sha256(self.path)
 
+    def get_info(self):
+        """Return MPEGInfo with duration, bitrate, sample rate and VBR status read from MPEG headers.
+
+        Result is cached, raise MP3.headers.HeaderError when file has no valid MPEG frames.
+        """
+        if self.info is None:
+            self.info = MP3.headers.read_info(self.path)
+        return self.info
+
+    def get_duration(self):
+        """Return duration in seconds or None if it can't be read."""
+        try:
+            return self.get_info().duration
+        except (MP3.headers.HeaderError, OSError):
+            return None
+
     def set_img(self, path_to_img, img="Front cover"):
         """Set APIC to file.
 
@@ -104,12 +198,38 @@ class SimpleMP3:
         :param img: img name(APIC:img).
         :return returns nothing.
         """
-        image_data = bytes()
         with open(path_to_img, "rb") as file:
-            for bit in file:
-                image_data += bit
+            image_data = file.read()
+        self.set_img_data(image_data, img)
+
+    def set_img_data(self, image_data, img="Front cover"):
+        """Set APIC to file from image bytes.
+
+        :param image_data: bytes of image.
+        :param img: img name(APIC:img).
+        :return returns nothing.
+        """
         self.audio.add(APIC(3, 'image/jpeg', 3, img, image_data))
-        self.audio.save(self.path)
+        self._commit()
+
+    def get_img_data(self, img=None):
+        """Return bytes of APIC image.
+
+        :param img: img name(APIC:img), first APIC is used if it's not given.
+        :return returns image data, raise TagError if there is no such APIC.
+        """
+        if not img:
+            frames = self.audio.getall("APIC")
+            if not frames:
+                raise TagError("No such tag APIC:")
+            return frames[0].data
+        if "APIC:" + img in self.audio:
+            return self.audio["APIC:" + img].data
+        raise TagError("No such tag APIC:" + img)
+
+    def get_imgs(self):
+        """Return list of (img name, image data) of all APIC."""
+        return [(frame.desc, frame.data) for frame in self.audio.getall("APIC")]
 
     def get_img_ext(self, img=None):
         """Get APIC image extension.
@@ -117,53 +237,16 @@ class SimpleMP3:
         :param img: img name(APIC:img)
         :return returns nothing.
         """
-        image_data = None
-        if not img:
-            tags = self.get_tag_list()
-            for el in tags:
-                if isinstance(el, list):
-                    try:
-                        if el[0].startswith('APIC'):
-                            image_data = self.audio[el[0]].data
-                            break
-                    except IndexError:
-                        pass
-        else:
-            temp = list()
-            for k in self.audio:
-                temp.append(k)
-            if "APIC:" + img in temp:
-                image_data = self.audio["APIC:" + img].data
-            else:
-                raise TagError("No such tag APIC:" + img)
+        try:
+            image_data = self.get_img_data(img)
+        except TagError:
+            if img:
+                raise
+            image_data = None
         return filetype.guess(image_data).extension
 
     def get_img(self, aimg, img=None):
-        tag_founded = False
-        if not img:
-            tags = self.get_tag_list()
-            for el in tags:
-                if isinstance(el, list):
-                    try:
-                        if el[0].startswith('APIC'):
-                            imagedata = self.audio[el[0]].data
-                            tag_founded = True
-                            break
-                    except IndexError:
-                        pass
-        else:
-            temp = list()
-            for k in self.audio:
-                temp.append(k)
-            if "APIC:" + img in temp:
-                imagedata = self.audio["APIC:" + img].data
-                tag_founded = True
-            else:
-                raise TagError("No such tag APIC:" + img)
-
-        if not tag_founded:
-            raise TagError("No such tag APIC:")
-
+        imagedata = self.get_img_data(img)
         kind = filetype.guess(imagedata)
         path = aimg + "." + kind.extension
         file = open(path, "wb")
@@ -174,10 +257,9 @@ class SimpleMP3:
     def del_img(self, al=False, img=""):
         if not al:
             self.audio.delall('APIC:' + img)
-            self.audio.save(self.path)
         else:
             self.audio.delall("APIC")
-            self.audio.save(self.path)
+        self._commit()
 
     def get_tag_list(self):
         res = list()
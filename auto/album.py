@@ -2,55 +2,85 @@
 
 Function auto implement auto tagging, other functions allow you to work with associations dict.
 Structure of associations dict:
-{"author": {"association name": path to img file}}
+{"author": {"song title": album}}
+Older files used {"author": [(song title, album), ...]}, they are migrated when loaded.
 """
 
 
 from MP3.too_easy_mp3 import SimpleMP3
+from MP3.headers import read_text_frames
+from auto.snapshot import Snapshot, is_snapshot
+from auto.duplicates import walk_mp3
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
 import pickle
 import os.path
 import os
 import sys
 
 
-def auto(file, associations, replace=True):
+HARVEST_BATCH = 1024
+
+
+def auto(file, associations, replace=True, index=None):
     """Set album tag to file using established associations which given by associations argument.
     This function need already established artist nad title tag in file.
 
     OPTIONS
         replace: boolean
             If this option is False set album tag only if that tag isn't exist.
+        index: auto.keys.AssociationIndex
+            Index of associations, used to find artist and title written with different case or whitespace.
+
+    Return True if file was changed.
     """
 
     audio = SimpleMP3(file)
     artist = str(audio["artist"])
     title = str(audio["title"])
-    if replace:
-        if artist in associations:
-            for el in associations[artist]:
-                if title == el[0]:
-                    audio["album"] = el[1]
-        else:
-            raise FormatError("No album associations for file " + file)
-    else:
+    if index:
+        artist = index.artist(artist) or artist
         if artist in associations:
-            try:
-                if not audio["album"]:
-                    for el in associations[artist]:
-                        if title == el[0]:
-                            audio["album"] = el[1]
-            except TypeError:
-                pass
-        else:
-            raise FormatError("No album associations for file " + file)
+            title = index.title(artist, title) or title
+    if artist not in associations:
+        raise FormatError("No album associations for file " + file)
+    album = associations[artist].get(title)
+    if album is None:
+        return False
+    current = audio["album"]
+    if current is not None and str(current) == album:
+        return False
+    if replace or not current:
+        audio["album"] = album
+        return True
+    return False
 
 
 def load_associations(path):
-    """Return(Deserialize) dict of associations from path."""
+    """Return(Deserialize) dict of associations from path, or read-only auto.snapshot.Snapshot if path is a
+    snapshot file.
+    """
+
+    if is_snapshot(path):
+        return Snapshot(path)
 
     with open(path, "rb") as file:
         album_associations = pickle.load(file)
-    return album_associations
+    return migrate(album_associations)
+
+
+def migrate(assoc):
+    """Convert lists of (title, album) tuples from old associations format to dicts, return assoc."""
+    for author in assoc:
+        if isinstance(assoc[author], list):
+            titles = dict()
+            for el in assoc[author]:
+                try:
+                    titles[el[0]] = el[1]
+                except IndexError:
+                    pass
+            assoc[author] = titles
+    return assoc
 
 
 def save_associations(assoc, path):
@@ -60,7 +90,7 @@ def save_associations(assoc, path):
         pickle.dump(assoc, file)
 
 
-def add_association(assoc, author, title="", album=""):
+def add_association(assoc, author, title="", album="", index=None):
     """Update assoc dict with new association.
 
     OPTIONS
@@ -68,20 +98,23 @@ def add_association(assoc, author, title="", album=""):
             Used to set title of song which be associated with album.
         album: str
             Used to set album which be associated.
+        index: auto.keys.AssociationIndex
+            Index of assoc, artist and title which differ from existing ones only in case or whitespace are merged
+            with them.
     """
 
+    if index:
+        author = index.artist(author, fuzzy=False) or author
+        if author in assoc:
+            title = index.title(author, title, fuzzy=False) or title
     if author not in assoc:
-        assoc[author] = list()
-        assoc[author].append((title, album))
-    else:
-        for i in range(len(assoc[author])):
-            if assoc[author][i][0] == title:
-                assoc[author][i] = (title, album)
-                return
-        assoc[author].append((title, album))
+        assoc[author] = dict()
+    assoc[author][title] = album
+    if index:
+        index.add(author, title)
 
 
-def associate(assoc, path, album="", file=sys.stdout):
+def associate(assoc, path, album="", file=sys.stdout, index=None):
     """Update assoc dict with associated album to all mp3 in path(should be folder)
 
     OPTIONS
@@ -89,28 +122,80 @@ def associate(assoc, path, album="", file=sys.stdout):
             Used to set album which be associated.
         file: object
             File-like object (stream); defaults to the current sys.stdout.
+        index: auto.keys.AssociationIndex
+            Index of assoc, see add_association.
      """
     out = file
 
     for el in os.listdir(path):
         el_path = path + "/" + el
         if os.path.isfile(el_path) and el_path.endswith(".mp3"):
-            file = SimpleMP3(el_path)
-            add_association(assoc, str(file["artist"]), title=str(file["title"]), album=album)
-            print("association added" + " - " + str(file["artist"]) + " - " + str(file["title"]) + " - " + album,
-                  file=out)
+            tags = _read_tags(el_path, frames=("TPE1", "TIT2")) or dict()
+            artist, title = tags.get("TPE1"), tags.get("TIT2")
+            if not artist or not title:
+                print("[Error]" + el_path + " skipped, it has no artist or title tag.", file=out)
+                continue
+            add_association(assoc, artist, title=title, album=album, index=index)
+            print("association added" + " - " + artist + " - " + title + " - " + album, file=out)
         else:
             pass
 
 
-def del_association(assoc, author, title=""):
-    """Delete association from assoc dict."""
+def harvest(assoc, roots, album="", workers=8, file=sys.stdout, index=None):
+    """Update assoc dict with associations learned from tags of all mp3 in roots and their subdirectories.
+    Only artist, title and album frames are read, files are read by a pool of threads.
+
+    OPTIONS
+        album: str
+            Album associated with every file, if it's empty album is taken from album tag of file and files without
+            it are skipped.
+        workers: int
+            Number of threads which read files.
+        file: object
+            File-like object (stream); defaults to the current sys.stdout.
+        index: auto.keys.AssociationIndex
+            Index of assoc, see add_association.
 
+    Return number of added associations.
+    """
+    paths = (path for path, stat in walk_mp3(roots))
+    files = 0
+    added = 0
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        while True:
+            batch = list(islice(paths, HARVEST_BATCH))
+            if not batch:
+                break
+            files += len(batch)
+            for tags in executor.map(_read_tags, batch):
+                if not tags:
+                    continue
+                artist, title, album_ = tags.get("TPE1"), tags.get("TIT2"), album or tags.get("TALB")
+                if artist and title and album_:
+                    add_association(assoc, artist, title=title, album=album_, index=index)
+                    added += 1
+    print("[Info]Harvested {} associations from {} files.".format(added, files), file=file)
+    return added
+
+
+def _read_tags(path, frames=("TPE1", "TIT2", "TALB")):
+    try:
+        return read_text_frames(path, frames=frames)
+    except OSError:
+        return None
+
+
+def del_association(assoc, author, title="", index=None):
+    """Delete association from assoc dict, index is used to find artist and title like in auto."""
+
+    if index:
+        author = index.artist(author, fuzzy=False) or author
+        if author in assoc:
+            title = index.title(author, title, fuzzy=False) or title
     if author in assoc:
-        for i in range(len(assoc[author])):
-            if assoc[author][i][0] == title:
-                del assoc[author][i]
-                return
+        assoc[author].pop(title, None)
+        if index:
+            index.discard(author, title)
 
 
 def get_associations(assoc):
@@ -118,11 +203,8 @@ def get_associations(assoc):
 
     res = list()
     for author in assoc:
-        try:
-            for el in assoc[author]:
-                res.append((author, el[0], el[1]))
-        except IndexError:
-            pass
+        for title in assoc[author]:
+            res.append((author, title, assoc[author][title]))
     return res
 
 
@@ -131,7 +213,7 @@ def update_associations(assoc, path):
 
     with open(path, "rb") as file:
         temp = pickle.load(file)
-    assoc.update(temp)
+    assoc.update(migrate(temp))
 
 
 def clear_associations():
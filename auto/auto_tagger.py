@@ -4,6 +4,14 @@
 import auto.name
 import auto.img
 import auto.album
+import auto.keys
+import auto.storage
+import auto.snapshot
+import auto.journal
+import auto.exchange
+import auto.duplicates
+import auto.covers
+import auto.catalog
 import os.path
 import sys
 
@@ -12,7 +20,8 @@ class AutoTagger:
     """Class used to link ban list and associations files with auto tagging functions, use auto tag functions
      and simplify editing associations dicts.
     """
-    def __init__(self, ban_list, associations, album_associations, file=sys.stdout):
+    def __init__(self, ban_list, associations, album_associations, file=sys.stdout, templates=None, fuzzy=False,
+                 database=None, journal=True, catalog=None):
         """
         Construct a new 'AutoTagger' object.
         Load associations dicts and ban list from given path, when files not founded use empty dicts and list.
@@ -21,46 +30,82 @@ class AutoTagger:
         :param ban_list: path to file which contain list of banned words/symbols.
         :param associations: path to file which contain dict of APIC associations.
         :param album_associations: path to file which contain dict of album associations.
+        :param templates: path to file which contain list of filename templates.
+        :param fuzzy: look up similar artists and titles when there is no association with the same canonical key.
+        :param database: path to SQLite database used to store associations and ban list instead of pickle files.
+        Associations files are imported to empty database once, ban list file is imported each time it's changed.
+        :param journal: save changes of associations files to append-only journals instead of rewriting them.
+        :param catalog: path to SQLite library catalog, tagged files are updated in it.
         :return returns nothing.
         """
 
         self.ban_list = list()
+        self.templates = None
+        self.associations_index = None
+        self.album_associations_index = None
+        self.store = None
+        self.catalog = None
+        self.ban_matcher = None
         self.associations = auto.img.clear_associations()
         self.album_associations = auto.album.clear_associations()
 
         self.ban_list_path = ban_list
         self.associations_path = associations
         self.album_associations_path = album_associations
+        self.templates_path = templates
+        self.fuzzy = fuzzy
+        self.journal = journal and not database
         self.file = file
 
-        try:
-            self.ban_list = auto.name.form_ban_list(self.ban_list_path)
-            print("[Info]Ban list file loaded.", file=self.file)
-        except FileNotFoundError:
-            print("[Error]Ban list file not founded.", file=self.file)
+        if catalog:
+            self.catalog = auto.catalog.Catalog(catalog)
 
-        try:
-            self.associations = auto.img.load_associations(self.associations_path)
-            print("[Info]Img associations file loaded.", file=self.file)
-        except FileNotFoundError:
-            print("[Error]Img associations file not founded.", file=self.file)
+        if database:
+            self.open_store(database)
+        else:
+            try:
+                self.ban_list = auto.name.form_ban_list(self.ban_list_path)
+                print("[Info]Ban list file loaded.", file=self.file)
+            except FileNotFoundError:
+                print("[Error]Ban list file not founded.", file=self.file)
 
-        try:
-            self.album_associations = auto.album.load_associations(self.album_associations_path)
-            print("[Info]Album associations file loaded.", file=self.file)
-        except FileNotFoundError:
-            print("[Error]Album associations file not founded.", file=self.file)
+            try:
+                self.associations = auto.img.load_associations(self.associations_path)
+                print("[Info]Img associations file loaded.", file=self.file)
+            except FileNotFoundError:
+                print("[Error]Img associations file not founded.", file=self.file)
+
+            try:
+                self.album_associations = auto.album.load_associations(self.album_associations_path)
+                print("[Info]Album associations file loaded.", file=self.file)
+            except FileNotFoundError:
+                print("[Error]Album associations file not founded.", file=self.file)
+
+            if self.journal:
+                self.journal_associations()
+
+        self.index_associations('img')
+        self.index_associations('album')
+
+        if self.templates_path:
+            try:
+                self.templates = auto.name.TemplateMatcher(auto.name.form_templates(self.templates_path))
+                print("[Info]Templates file loaded.", file=self.file)
+            except FileNotFoundError:
+                print("[Error]Templates file not founded.", file=self.file)
+            except auto.name.TemplateError as e:
+                print("[Error]" + e.value, file=self.file)
 
     def auto_tag(self, path, replaces=None, parent=None):
         """
         Automatically set audio tags to file or files in directory.
 
-        :param path: path to file or directory which should be tagged.
-        :param replaces: dict of tkinter.VarInt, used to decide replace existing tags or not.
-        Can contain 'Title', 'Artist', 'Image', 'Album' entries.
+        :param path: path to file or directory which should be tagged, or list of paths to files(work list).
+        :param replaces: dict of tkinter.VarInt or booleans, used to decide replace existing tags or not(True or 1
+        means don't replace).  Can contain 'Title', 'Artist', 'Image', 'Album' entries.
         :param parent: link to parent object which allows user to start tagging.
         Use parent stop attribute to check shouldn't be tagging interrupted.
-        :return returns nothing
+        :return returns list of paths to files which were changed.
         """
 
         replace_title = True
@@ -69,63 +114,255 @@ class AutoTagger:
         replace_album = True
 
         if replaces:
-            if replaces['Title'].get() == 0:
+            if _value(replaces['Title']) == 0:
                 replace_title = True
             else:
                 replace_title = False
-            if replaces['Artist'].get() == 0:
+            if _value(replaces['Artist']) == 0:
                 replace_artist = True
             else:
                 replace_artist = False
-            if replaces['Image'].get() == 0:
+            if _value(replaces['Image']) == 0:
                 replace_img = True
             else:
                 replace_img = False
-            if replaces['Album'].get() == 0:
+            if _value(replaces['Album']) == 0:
                 replace_album = True
             else:
                 replace_album = False
 
-        if os.path.isfile(path):
+        ban_list = self.get_ban_matcher()
+        options = dict(replace_title=replace_title, replace_artist=replace_artist, replace_img=replace_img,
+                       replace_album=replace_album)
+        changed = list()
+
+        if isinstance(path, (list, tuple)):
+            for el in path:
+                if not os.path.isfile(el):
+                    print("[Error]No such file: " + el, file=self.file)
+                    continue
+                if self.tag_file(el, ban_list, **options):
+                    changed.append(el)
+                if parent:
+                    if parent.stop:
+                        break
+
+        elif os.path.isfile(path):
             if path.endswith(".mp3"):
-                name = os.path.split(path)[1]
-                print("[Info]Adding tags to: " + name, file=self.file)
-                auto.name.auto(path, self.ban_list, replace_artist=replace_artist, replace_title=replace_title)
-                try:
-                    auto.img.auto(path, self.associations, replace=replace_img)
-                except auto.img.FormatError:
-                    print("[Error]No img associations to file: " + name, file=self.file)
-                except FileNotFoundError:
-                    print("[Error]Failed to find img", file=self.file)
-                try:
-                    auto.album.auto(path, self.album_associations, replace=replace_album)
-                except auto.album.FormatError:
-                    print("[Error]No album associations to file: " + name, file=self.file)
+                if self.tag_file(path, ban_list, **options):
+                    changed.append(path)
             else:
                 print("[ErrorCodeRed]Error: Not supported type", file=self.file)
 
         elif os.path.isdir(path):
             for el in os.listdir(path):
                 if el.endswith(".mp3"):
-                    print("[Info]Adding tags to: " + el, file=self.file)
-                    auto.name.auto(os.path.normpath(path + "/" + el), self.ban_list,
-                                   replace_artist=replace_artist, replace_title=replace_title)
-                    try:
-                        auto.img.auto(os.path.normpath(path + "/" + el), self.associations, replace=replace_img)
-                    except auto.img.FormatError:
-                        print("[Error]No img associations to file: " + el, file=self.file)
-                    except FileNotFoundError:
-                        print("[Error]Failed to find img", file=self.file)
-                    try:
-                        auto.album.auto(os.path.normpath(path + "/" + el),
-                                        self.album_associations, replace=replace_album)
-                    except auto.album.FormatError:
-                        print("[Error]No album associations to file: " + el, file=self.file)
+                    el = os.path.normpath(path + "/" + el)
+                    if self.tag_file(el, ban_list, **options):
+                        changed.append(el)
                     if parent:
                         if parent.stop:
-                            return
+                            break
         else:
             print("[ErrorCodeRed]Error: No such file or directory", file=self.file)
+        return changed
+
+    def tag_file(self, path, ban_list, replace_title=True, replace_artist=True, replace_img=True, replace_album=True):
+        """
+        Set audio tags to one mp3 file and update its catalog entry.
+
+        :param path: path to file.
+        :param ban_list: compiled ban list(auto.name.BanMatcher).
+        :return returns True if file was changed.
+        """
+        name = os.path.split(path)[1]
+        print("[Info]Adding tags to: " + name, file=self.file)
+        changed = auto.name.auto(path, ban_list, replace_artist=replace_artist, replace_title=replace_title,
+                                 templates=self.templates)
+        try:
+            changed = auto.img.auto(path, self.associations, replace=replace_img,
+                                    index=self.associations_index) or changed
+        except auto.img.FormatError:
+            print("[Error]No img associations to file: " + name, file=self.file)
+        except FileNotFoundError:
+            print("[Error]Failed to find img", file=self.file)
+        try:
+            changed = auto.album.auto(path, self.album_associations, replace=replace_album,
+                                      index=self.album_associations_index) or changed
+        except auto.album.FormatError:
+            print("[Error]No album associations to file: " + name, file=self.file)
+        if self.catalog and changed:
+            self.catalog.update(path)
+        return changed
+
+    def work_list(self, query, roots=None, since=None):
+        """
+        Rescan catalog and return paths of files which need tagging work, result can be given to auto_tag.
+
+        :param query: name of query from auto.catalog.QUERIES.
+        :param roots: path or list of paths to directories which are searched, whole catalog if None.
+        :param since: timestamp for 'changed-since' query.
+        :return returns list of paths.
+        """
+        if not self.catalog:
+            print("[Error]Library catalog isn't opened.", file=self.file)
+            return []
+        if roots:
+            try:
+                self.catalog.rescan(roots, file=self.file)
+            except auto.duplicates.SearchError as e:
+                print("[Error]" + e.value, file=self.file)
+                return []
+        paths = self.catalog.query(query, roots=roots, since=since, assoc=self.associations,
+                                   index=self.associations_index)
+        print("[Info]Work list: {} files.".format(len(paths)), file=self.file)
+        return paths
+
+    def tagging_state(self):
+        """
+        Return picklable state needed to tag files: compiled ban list, templates, current associations(with changes
+        which aren't saved yet) and path to catalog.  It's used to tag files in child process, see from_state.
+
+        :return returns dict.
+        """
+        return dict(ban_list=list(self.get_ban_matcher().items), templates=self.templates,
+                    associations=_portable(self.associations),
+                    album_associations=_portable(self.album_associations), fuzzy=self.fuzzy,
+                    catalog=self.catalog.path if self.catalog else None)
+
+    @classmethod
+    def from_state(cls, state, file=sys.stdout):
+        """
+        Construct AutoTagger from tagging_state of other one, nothing is loaded from associations files.
+        It can tag files, but its associations aren't saved anywhere.
+
+        :param state: dict returned by tagging_state.
+        :param file: file-like object to redirect output.
+        :return returns AutoTagger object.
+        """
+        tagger = cls.__new__(cls)
+        tagger.file = file
+        tagger.ban_list = state["ban_list"]
+        tagger.ban_matcher = None
+        tagger.ban_list_path = None
+        tagger.templates = state["templates"]
+        tagger.templates_path = None
+        tagger.fuzzy = state["fuzzy"]
+        tagger.store = None
+        tagger.journal = False
+        tagger.associations_path = None
+        tagger.album_associations_path = None
+        tagger.associations = _restore(state["associations"])
+        tagger.album_associations = _restore(state["album_associations"])
+        tagger.catalog = auto.catalog.Catalog(state["catalog"]) if state["catalog"] else None
+        tagger.index_associations('img')
+        tagger.index_associations('album')
+        return tagger
+
+    def open_store(self, database):
+        """
+        Use SQLite database as storage of associations and ban list.  Associations pickle files are imported only
+        once(recorded as imported_<type> in meta table), so cleared database isn't filled from them again.
+
+        :param database: path to database file.
+        :return returns nothing.
+        """
+        self.store = auto.storage.SQLiteStore(database)
+        for assoc_type, module, path in (('img', auto.img, self.associations_path),
+                                         ('album', auto.album, self.album_associations_path)):
+            marker = 'imported_' + assoc_type
+            if self.store.meta(marker) is None and path and os.path.isfile(path):
+                if self.store.is_empty(assoc_type):
+                    self.store.import_associations(assoc_type, module.load_associations(path))
+                    print("[Info]{} associations imported to database.".format(assoc_type.capitalize()),
+                          file=self.file)
+                self.store.set_meta(marker, path)
+        try:
+            self.store.import_ban_list(self.ban_list_path)
+        except (FileNotFoundError, TypeError):
+            pass
+        self.store.commit()
+        self.associations = self.store.associations('img')
+        self.album_associations = self.store.associations('album')
+        self.ban_list = self.store.load_ban_list()
+        print("[Info]Associations database loaded.", file=self.file)
+
+    def get_ban_matcher(self):
+        """
+        Return compiled ban list.  Ban list file is compiled again only if it was changed since last call.
+
+        :return returns auto.name.BanMatcher object.
+        """
+        if self.store:
+            try:
+                changed = self.store.import_ban_list(self.ban_list_path)
+            except (FileNotFoundError, TypeError):
+                changed = False
+            if changed or not self.ban_matcher:
+                self.ban_list = self.store.load_ban_list()
+                self.ban_matcher = auto.name.compile_ban_list(self.ban_list)
+            return self.ban_matcher
+
+        try:
+            matcher = auto.name.load_ban_matcher(self.ban_list_path)
+            self.ban_list = list(matcher.items)
+        except (FileNotFoundError, TypeError):
+            matcher = auto.name.compile_ban_list(self.ban_list)
+        return matcher
+
+    def journal_associations(self):
+        """
+        Wrap associations dicts loaded from pickle files to record their changes in journals, replay journals.
+
+        :return returns nothing.
+        """
+        if self.associations_path and not isinstance(self.associations, auto.snapshot.Snapshot):
+            self.associations = auto.journal.JournaledAssociations(self.associations, self.associations_path)
+        if self.album_associations_path and not isinstance(self.album_associations, auto.snapshot.Snapshot):
+            self.album_associations = auto.journal.JournaledAssociations(self.album_associations,
+                                                                         self.album_associations_path)
+
+    def index_associations(self, assoc_type):
+        """
+        Build canonical key index of one of associations dict.
+
+        :param assoc_type: string with dict name(should be 'img' or 'album').
+        :return returns nothing.
+        """
+        if assoc_type == 'img':
+            self.associations_index = None
+            if not isinstance(self.associations, auto.snapshot.Snapshot):
+                self.associations_index = auto.keys.AssociationIndex(self.associations, fuzzy=self.fuzzy)
+        elif assoc_type == 'album':
+            self.album_associations_index = None
+            if not isinstance(self.album_associations, auto.snapshot.Snapshot):
+                self.album_associations_index = auto.keys.AssociationIndex(self.album_associations, fuzzy=self.fuzzy)
+
+    def is_read_only(self, assoc_type):
+        """
+        Check if one of associations dict is a read-only snapshot and report it.
+
+        :param assoc_type: string with dict name(should be 'img' or 'album').
+        :return returns True if associations can't be changed.
+        """
+        assoc = self.associations if assoc_type == 'img' else self.album_associations
+        if isinstance(assoc, auto.snapshot.Snapshot):
+            print("[Error]Associations snapshot is read-only.", file=self.file)
+            return True
+        return False
+
+    def compile_snapshot(self, assoc_type, path):
+        """
+        Write memory-mapped snapshot of one of associations dict, it can be used instead of associations file.
+
+        :param assoc_type: string with dict name(should be 'img' or 'album').
+        :param path: string with path to snapshot file.
+        :return returns nothing.
+        """
+        if assoc_type == 'img':
+            auto.snapshot.compile_snapshot(self.associations, path)
+        elif assoc_type == 'album':
+            auto.snapshot.compile_snapshot(self.album_associations, path)
 
     def add_association(self, assoc_type, author, img="", assoc_name="", title="", album=""):
         """
@@ -139,10 +376,14 @@ class AutoTagger:
         :param album: string with album(used with assoc_type 'album').
         :return returns nothing.
         """
+        if self.is_read_only(assoc_type):
+            return
         if assoc_type == 'img':
-            auto.img.add_association(self.associations, author, img=img, assoc_name=assoc_name)
+            auto.img.add_association(self.associations, author, img=img, assoc_name=assoc_name,
+                                     index=self.associations_index)
         elif assoc_type == 'album':
-            auto.album.add_association(self.album_associations, author, title=title, album=album)
+            auto.album.add_association(self.album_associations, author, title=title, album=album,
+                                       index=self.album_associations_index)
 
     def associate(self, assoc_type, path, type_="", album="", file=sys.stdout):
         """
@@ -155,10 +396,83 @@ class AutoTagger:
         :param file: file-like object to redirect output.
         :return returns nothing.
         """
+        if self.is_read_only(assoc_type):
+            return
         if assoc_type == 'img':
-            auto.img.associate(self.associations, path, typ=type_, file=file)
+            auto.img.associate(self.associations, path, typ=type_, file=file, index=self.associations_index)
         elif assoc_type == 'album':
-            auto.album.associate(self.album_associations, path, album=album, file=file)
+            auto.album.associate(self.album_associations, path, album=album, file=file,
+                                 index=self.album_associations_index)
+
+    def harvest(self, roots, album="", workers=8):
+        """
+        Update album associations with associations learned from tags of all files in roots and their subdirectories.
+
+        :param roots: path or list of paths to directories.
+        :param album: string with album associated with every file, by default album is taken from album tag.
+        :param workers: number of threads which read files.
+        :return returns number of added associations.
+        """
+        if self.is_read_only('album'):
+            return 0
+        try:
+            return auto.album.harvest(self.album_associations, roots, album=album, workers=workers, file=self.file,
+                                      index=self.album_associations_index)
+        except auto.duplicates.SearchError as e:
+            print("[Error]" + e.value, file=self.file)
+            return 0
+
+    def dedupe_images(self, path, delete=False):
+        """
+        Find near duplicate covers in images directory and point img associations to the best copy of each cover.
+
+        :param path: path to images directory.
+        :param delete: delete other copies.
+        :return returns dict {path to replaced copy: path to kept image}.
+        """
+        if self.is_read_only('img'):
+            return dict()
+        replaced = auto.covers.dedupe_images(self.associations, path, delete=delete, file=self.file)
+        print("[Info]{} duplicate images found.".format(len(replaced)), file=self.file)
+        return replaced
+
+    def find_cover_mismatches(self, roots):
+        """
+        Find tracks whose embedded cover differs from image associated with their artist.
+
+        :param roots: path or list of paths to directories.
+        :return returns list of (path, association name, distance), distance is None if there is no such cover.
+        """
+        res = list()
+        try:
+            for path, key, dist in auto.covers.find_mismatches(self.associations, roots,
+                                                               index=self.associations_index, file=self.file):
+                print("[Error]Cover differs from association: {} - APIC:{}".format(path, key), file=self.file)
+                res.append((path, key, dist))
+        except auto.duplicates.SearchError as e:
+            print("[Error]" + e.value, file=self.file)
+        return res
+
+    def export_covers(self, roots, destination, associate=False, workers=8):
+        """
+        Write every distinct cover embedded in files from roots to destination with manifest.csv of tracks.
+
+        :param roots: path or list of paths to directories.
+        :param destination: path to directory for covers.
+        :param associate: associate every artist with his most frequent exported cover.
+        :param workers: number of threads which read tracks and write covers.
+        :return returns dict with numbers of tracks, covers and written images or None on error.
+        """
+        try:
+            summary = auto.covers.export_covers(roots, destination, workers=workers, file=self.file)
+        except auto.duplicates.SearchError as e:
+            print("[Error]" + e.value, file=self.file)
+            return None
+        if associate and not self.is_read_only('img'):
+            count = auto.covers.associate_manifest(self.associations, os.path.join(destination, "manifest.csv"),
+                                                   destination, index=self.associations_index)
+            print("[Info]{} img associations added.".format(count), file=self.file)
+        return summary
 
     def del_association(self, assoc_type, author, assoc_name="", title=""):
         """
@@ -170,10 +484,13 @@ class AutoTagger:
         :param title: string with song title(used with assoc_type 'album').
         :return returns nothing.
         """
+        if self.is_read_only(assoc_type):
+            return
         if assoc_type == 'img':
-            auto.img.del_association(self.associations, author, assoc_name=assoc_name)
+            auto.img.del_association(self.associations, author, assoc_name=assoc_name, index=self.associations_index)
         elif assoc_type == 'album':
-            auto.album.del_association(self.album_associations, author, title=title)
+            auto.album.del_association(self.album_associations, author, title=title,
+                                       index=self.album_associations_index)
 
     def get_associations(self, assoc_type):
         """
@@ -195,10 +512,62 @@ class AutoTagger:
         :param path: string with path to file.
         :return returns nothing.
         """
+        if self.is_read_only(assoc_type):
+            return
         if assoc_type == 'img':
             auto.img.update_associations(self.associations, path)
         elif assoc_type == 'album':
             auto.album.update_associations(self.album_associations, path)
+        self.index_associations(assoc_type)
+
+    def import_associations(self, assoc_type, path, replace=False):
+        """
+        Merge associations from CSV or JSON lines file into one of associations dict, report conflicts.
+
+        :param assoc_type: string with dict name(should be 'img' or 'album').
+        :param path: string with path to file.
+        :param replace: replace existing associations by conflicting rows.
+        :return returns dict with numbers of added, unchanged, replaced and conflicting rows or None on error.
+        """
+        if self.is_read_only(assoc_type):
+            return None
+        if assoc_type == 'img':
+            assoc, index = self.associations, self.associations_index
+        else:
+            assoc, index = self.album_associations, self.album_associations_index
+        summary = auto.exchange.new_summary()
+        try:
+            auto.exchange.import_associations(assoc, path, assoc_type, replace=replace, index=index, summary=summary,
+                                              file=self.file)
+        except FileNotFoundError:
+            print("[Error]Import file not founded.", file=self.file)
+            return None
+        except auto.exchange.ExchangeError as e:
+            error = e.value
+        except ValueError:
+            error = "Import file is malformed."
+        else:
+            error = None
+        if error:
+            print("[Error]" + error, file=self.file)
+            print("[Error]Import stopped, rows applied before error: {added} added, {replaced} replaced.".format(
+                **summary), file=self.file)
+            return None
+        print("[Info]Imported associations: {added} added, {unchanged} unchanged, {replaced} replaced, "
+              "{conflicts} conflicts.".format(**summary), file=self.file)
+        return summary
+
+    def export_associations(self, assoc_type, path):
+        """
+        Write one of associations dict to CSV or JSON lines file(chosen by '.jsonl' extension).
+
+        :param assoc_type: string with dict name(should be 'img' or 'album').
+        :param path: string with path to file.
+        :return returns nothing.
+        """
+        assoc = self.associations if assoc_type == 'img' else self.album_associations
+        count = auto.exchange.export_associations(assoc, path, assoc_type)
+        print("[Info]Exported {} associations.".format(count), file=self.file)
 
     def clear_associations(self, assoc_type):
         """
@@ -207,19 +576,55 @@ class AutoTagger:
         :param assoc_type: string with dict name(should be 'img' or 'album').
         :return returns nothing.
         """
-        if assoc_type == 'img':
+        if self.is_read_only(assoc_type):
+            return
+        if self.store or self.journal:
+            if assoc_type == 'img':
+                self.associations.clear()
+            elif assoc_type == 'album':
+                self.album_associations.clear()
+        elif assoc_type == 'img':
             self.associations = auto.img.clear_associations()
         elif assoc_type == 'album':
             self.album_associations = auto.album.clear_associations()
+        self.index_associations(assoc_type)
 
     def save_associations(self, assoc_type):
         """
-        Save changes in one of associations dict to his file.
+        Save changes in one of associations dict to his file(or its journal, or commit them to database).
 
         :param assoc_type: string with dict name(should be 'img' or 'album').
         :return returns nothing.
         """
-        if assoc_type == 'img':
+        if self.is_read_only(assoc_type):
+            return
+        if self.store:
+            self.store.commit()
+        elif self.journal:
+            if assoc_type == 'img':
+                self.associations.save()
+            elif assoc_type == 'album':
+                self.album_associations.save()
+        elif assoc_type == 'img':
             auto.img.save_associations(self.associations, self.associations_path)
         elif assoc_type == 'album':
             auto.album.save_associations(self.album_associations, self.album_associations_path)
+
+
+def _value(var):
+    """Return value of tkinter variable or var itself if it's a plain value."""
+    return var.get() if hasattr(var, "get") else var
+
+
+def _portable(assoc):
+    """Return picklable form of associations: path of snapshot, or plain dict copy of other mappings."""
+    if isinstance(assoc, auto.snapshot.Snapshot):
+        return assoc.path
+    return {artist: dict(assoc[artist]) for artist in assoc}
+
+
+def _restore(assoc):
+    """Return associations from _portable form."""
+    if isinstance(assoc, str):
+        return auto.snapshot.Snapshot(assoc)
+    return assoc
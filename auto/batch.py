@@ -0,0 +1,77 @@
+"""Module that implement editing of the same tags in many files at once.
+
+Every file is opened once, all changes are made in memory and written with one tag write, file which already has
+given values isn't written at all.  Image is read once for the whole batch.
+"""
+
+
+from MP3.too_easy_mp3 import SimpleMP3, TagError
+from mutagen import MutagenError
+import sys
+
+
+def batch_edit(paths, tags=None, clear=(), image=None, image_name="", delete_images=False, parent=None,
+               progress=None, file=sys.stdout):
+    """Set and clear tags of every file from paths.
+
+    OPTIONS
+        tags: dict
+            Tags which are set, SimpleMP3 tag synonyms as keys(e.g. {"album": "Album"}).
+        clear: iterable
+            SimpleMP3 tag synonyms of tags which are cleared.
+        image: str
+            Path to image file which is set as APIC:image_name.
+        image_name: str
+            Name which be written after APIC: in tag.
+        delete_images: boolean
+            If this option is True all APIC are deleted(before image is set).
+        parent: object
+            Object with stop attribute, editing is interrupted when it's True.
+        progress: function
+            Called with number of processed files and number of all files after every file.
+        file: object
+            File-like object (stream); defaults to the current sys.stdout.
+
+    Return list of paths to files which were changed.
+    """
+    tags = dict(tags or dict())
+    for k in clear:
+        tags[k] = ""
+    image_data = None
+    if image:
+        with open(image, "rb") as img:
+            image_data = img.read()
+
+    changed = list()
+    for i, path in enumerate(paths):
+        if parent and parent.stop:
+            print("[Info]Batch edit stopped.", file=file)
+            break
+        try:
+            if edit_file(path, tags, image_data=image_data, image_name=image_name, delete_images=delete_images):
+                changed.append(path)
+        except (MutagenError, OSError, TagError) as e:
+            print("[Error]Failed to edit " + path + ": " + str(e), file=file)
+        if progress:
+            progress(i + 1, len(paths))
+    print("[Info]Batch edit changed {} of {} files.".format(len(changed), len(paths)), file=file)
+    return changed
+
+
+def edit_file(path, tags, image_data=None, image_name="", delete_images=False):
+    """Apply tags(dict with SimpleMP3 tag synonyms as keys) and image to file with one write.
+
+    Return True if file was changed.
+    """
+    audio = SimpleMP3(path, autosave=False)
+    for k, value in tags.items():
+        if str(audio[k] or "") != value:
+            audio[k] = value
+    if delete_images and audio.get_imgs():
+        audio.del_img(al=True)
+    if image_data is not None and dict(audio.get_imgs()).get(image_name) != image_data:
+        audio.set_img_data(image_data, image_name)
+    if not audio.changed:
+        return False
+    audio.save()
+    return True
@@ -0,0 +1,376 @@
+"""Module that implement persistent SQLite catalog of audio library.
+
+Catalog keeps for every mp3 file its identity(device, inode, size, modification time), text tags, names and sha256
+of APIC images, duration and sha256 of file head and whole file.  Rescan stats files and reads again only those whose
+identity changed, so opening already cataloged folder costs a directory listing.  File hashes are computed on first
+request and kept until file changes.
+
+CatalogEntry gives SimpleMP3 like read access to cataloged tags, so widgets and tagging functions can use catalog
+instead of parsing files.
+
+Queries return sorted lists of paths of files which need tagging work, they can be given to AutoTagger.auto_tag as a
+work list.  Command line usage:
+    python -m auto.catalog catalog.db rescan root [root ...]
+    python -m auto.catalog catalog.db query missing-album|missing-title|missing-artist|missing-cover|changed-since
+                           [--root root] [--since YYYY-MM-DD] [--img path to img associations]
+                           [--db path to associations database]
+Associations for missing-cover are only read, neither journal nor database is changed.
+"""
+
+
+from MP3.too_easy_mp3 import SimpleMP3
+from MP3.hash_func import file_sha256, file_head_sha256
+from MP3.headers import read_info, HeaderError
+from mutagen import MutagenError
+from auto.duplicates import walk_mp3
+import hashlib
+import sqlite3
+import threading
+import json
+import time
+import os
+import os.path
+import sys
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (path TEXT PRIMARY KEY, dir TEXT NOT NULL, name TEXT NOT NULL,
+                                  dev INTEGER, ino INTEGER, size INTEGER, mtime_ns INTEGER,
+                                  title TEXT, artist TEXT, album TEXT, year TEXT, number TEXT,
+                                  apic TEXT NOT NULL DEFAULT '[]', duration REAL,
+                                  head_hash TEXT, hash TEXT, scanned REAL);
+CREATE INDEX IF NOT EXISTS files_dir ON files (dir);
+CREATE INDEX IF NOT EXISTS files_size ON files (size);
+CREATE INDEX IF NOT EXISTS files_mtime ON files (mtime_ns);
+CREATE INDEX IF NOT EXISTS files_no_title ON files (path) WHERE title IS NULL OR title = '';
+CREATE INDEX IF NOT EXISTS files_no_artist ON files (path) WHERE artist IS NULL OR artist = '';
+CREATE INDEX IF NOT EXISTS files_no_album ON files (path) WHERE album IS NULL OR album = '';
+CREATE INDEX IF NOT EXISTS files_no_apic ON files (path) WHERE apic = '[]';
+"""
+
+QUERIES = ("missing-title", "missing-artist", "missing-album", "missing-cover", "changed-since")
+
+TAGS = {"title": "TIT2", "artist": "TPE1", "album": "TALB", "year": "TDRC", "number": "TRCK"}
+
+COLUMNS = ("path", "dir", "name", "dev", "ino", "size", "mtime_ns", "title", "artist", "album", "year", "number",
+           "apic", "duration", "head_hash", "hash", "scanned")
+
+UPSERT = "INSERT OR REPLACE INTO files ({}) VALUES ({})".format(", ".join(COLUMNS), ", ".join("?" * len(COLUMNS)))
+
+
+class CatalogEntry:
+    """Cataloged state of one file.  Tags are read like from SimpleMP3: entry['title'], missing tag is None."""
+    def __init__(self, row):
+        for key, value in zip(COLUMNS, row):
+            setattr(self, key, value)
+        self.apic = json.loads(self.apic)
+
+    def __getitem__(self, k):
+        if k not in TAGS:
+            raise KeyError("Tag {} not supported".format(k))
+        return getattr(self, k)
+
+    def __iter__(self):
+        yield from TAGS
+
+    def get_imgs(self):
+        """Return list of (img name, sha256 of image data) of all APIC."""
+        return [tuple(el) for el in self.apic]
+
+    def get_size(self):
+        return self.size
+
+    def get_duration(self):
+        return self.duration
+
+    def is_current(self, st):
+        """Return True if file with stat st is the same as cataloged one.  Zero inode(scandir on Windows) is ignored."""
+        return (self.size == st.st_size and self.mtime_ns == st.st_mtime_ns and
+                (not st.st_ino or not self.ino or self.ino == st.st_ino))
+
+    def __repr__(self):
+        return "CatalogEntry({!r})".format(self.path)
+
+
+class Catalog:
+    """SQLite catalog of mp3 files."""
+    def __init__(self, path):
+        """
+        Construct a new 'Catalog' object, create database file if it doesn't exist.
+
+        :param path: path to database file.
+        :return returns nothing.
+        """
+        self.path = path
+        self.lock = threading.RLock()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.executescript(SCHEMA)
+        self.conn.commit()
+
+    def entry(self, path, st=None):
+        """Return CatalogEntry of file from path, file is read again if it was changed since last scan.
+
+        Return None if file doesn't exist or can't be read.
+        """
+        path = os.path.abspath(path)
+        if st is None:
+            try:
+                st = os.stat(path)
+            except OSError:
+                self.forget(path)
+                return None
+        row = self.query_one("SELECT {} FROM files WHERE path = ?".format(", ".join(COLUMNS)), (path,))
+        if row is not None:
+            entry = CatalogEntry(row)
+            if entry.is_current(st):
+                return entry
+        return self.update(path, st)
+
+    def update(self, path, st=None):
+        """Read file from path again and store it, return its CatalogEntry or None if it can't be read."""
+        path = os.path.abspath(path)
+        try:
+            if st is None:
+                st = os.stat(path)
+            row = read_row(path, st)
+        except (MutagenError, OSError):
+            self.forget(path)
+            return None
+        with self.lock:
+            self.conn.execute(UPSERT, row)
+            self.conn.commit()
+        return CatalogEntry(row)
+
+    def forget(self, path):
+        """Remove file from catalog."""
+        with self.lock:
+            self.conn.execute("DELETE FROM files WHERE path = ?", (os.path.abspath(path),))
+            self.conn.commit()
+
+    def scan_dir(self, path):
+        """Bring catalog of mp3 files in directory(without subdirectories) up to date.
+
+        :return returns dict {file name: CatalogEntry} in directory listing order.
+        """
+        path = os.path.abspath(path)
+        found = list()
+        for entry in os.scandir(path):
+            if entry.name.endswith(".mp3") and entry.is_file():
+                found.append((entry.path, entry.stat()))
+        entries = self._refresh(found, "SELECT {} FROM files WHERE dir = ?".format(", ".join(COLUMNS)), (path,),
+                                prune=True)
+        return {entry.name: entry for entry in entries}
+
+    def rescan(self, roots, file=sys.stdout):
+        """Bring catalog of all mp3 files in roots and their subdirectories up to date.
+
+        Files which disappeared from roots are removed from catalog.
+
+        :return returns dict with numbers of 'files', 'updated' and 'removed' files.
+        """
+        if isinstance(roots, str):
+            roots = [roots]
+        summary = dict(files=0, updated=0, removed=0)
+        found = [(os.path.abspath(path), st) for path, st in walk_mp3(roots)]
+        summary["files"] = len(found)
+        for root in roots:
+            prefix = os.path.join(os.path.abspath(root), "")
+            sql = "SELECT {} FROM files WHERE dir = ? OR substr(dir, 1, ?) = ?".format(", ".join(COLUMNS))
+            paths = [el for el in found if el[0].startswith(prefix)]
+            self._refresh(paths, sql, (prefix[:-1], len(prefix), prefix), prune=True, summary=summary)
+        print("[Info]Catalog rescanned: {files} files, {updated} updated, {removed} removed.".format(**summary),
+              file=file)
+        return summary
+
+    def _refresh(self, found, sql, args, prune=False, summary=None):
+        """Update catalog with found [(path, stat)], compare with rows selected by sql.
+
+        Rows which aren't found are deleted if prune is True, return list of CatalogEntry of found files.
+        """
+        known = {row[0]: CatalogEntry(row) for row in self.query_all(sql, args)}
+        res = list()
+        rows = list()
+        for path, st in found:
+            entry = known.pop(path, None)
+            if entry is None or not entry.is_current(st):
+                try:
+                    row = read_row(path, st)
+                except (MutagenError, OSError):
+                    continue
+                rows.append(row)
+                entry = CatalogEntry(row)
+            res.append(entry)
+        with self.lock:
+            self.conn.executemany(UPSERT, rows)
+            if prune:
+                self.conn.executemany("DELETE FROM files WHERE path = ?", ((path,) for path in known))
+            self.conn.commit()
+        if summary is not None:
+            summary["updated"] += len(rows)
+            summary["removed"] += len(known) if prune else 0
+        return res
+
+    def file_hash(self, path, head=False):
+        """Return sha256 of whole file(or of its head), it's computed only if file changed since last call."""
+        entry = self.entry(path)
+        if entry is None:
+            raise FileNotFoundError(path)
+        column = "head_hash" if head else "hash"
+        value = getattr(entry, column)
+        if value is None:
+            value = file_head_sha256(entry.path) if head else file_sha256(entry.path)
+            with self.lock:
+                self.conn.execute("UPDATE files SET {} = ? WHERE path = ?".format(column), (value, entry.path))
+                self.conn.commit()
+        return value
+
+    def missing_tag(self, tag, roots=None):
+        """Return paths of files without tag('title', 'artist' or 'album') in roots(all cataloged files if None)."""
+        if tag not in ("title", "artist", "album"):
+            raise CatalogError("Unknown tag " + str(tag))
+        where, args = _roots_clause(roots)
+        rows = self.query_all("SELECT path FROM files WHERE ({0} IS NULL OR {0} = '') AND {1} ORDER BY path"
+                              .format(tag, where), args)
+        return [row[0] for row in rows]
+
+    def missing_cover(self, assoc, roots=None, index=None):
+        """Return paths of files without APIC whose artist has img associations in assoc.
+
+        :param index: auto.keys.AssociationIndex of assoc, used to find artist written with different case or
+        whitespace.
+        """
+        where, args = _roots_clause(roots)
+        rows = self.query_all("SELECT path, artist FROM files WHERE apic = '[]' AND artist IS NOT NULL AND {} "
+                              "ORDER BY path".format(where), args)
+        res = list()
+        for path, artist in rows:
+            artist = artist.rstrip()
+            if index:
+                artist = index.artist(artist) or artist
+            if artist in assoc:
+                res.append(path)
+        return res
+
+    def changed_since(self, timestamp, roots=None):
+        """Return paths of files modified after timestamp(seconds since epoch)."""
+        where, args = _roots_clause(roots)
+        rows = self.query_all("SELECT path FROM files WHERE mtime_ns >= ? AND {} ORDER BY path".format(where),
+                              (int(timestamp * 10 ** 9),) + args)
+        return [row[0] for row in rows]
+
+    def query(self, name, roots=None, since=None, assoc=None, index=None):
+        """Run one of QUERIES by name and return paths of matched files.
+
+        :param since: timestamp for 'changed-since'.
+        :param assoc: img associations dict for 'missing-cover'.
+        :param index: auto.keys.AssociationIndex of assoc.
+        """
+        if name == "missing-cover":
+            return self.missing_cover(assoc or dict(), roots=roots, index=index)
+        if name == "changed-since":
+            return self.changed_since(since or 0, roots=roots)
+        if name in QUERIES:
+            return self.missing_tag(name.split("-", 1)[1], roots=roots)
+        raise CatalogError("Unknown query " + str(name))
+
+    def query_one(self, sql, args=()):
+        with self.lock:
+            return self.conn.execute(sql, args).fetchone()
+
+    def query_all(self, sql, args=()):
+        with self.lock:
+            return self.conn.execute(sql, args).fetchall()
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
+
+
+def _roots_clause(roots):
+    """Return (sql condition, args) which selects files in roots and their subdirectories."""
+    if not roots:
+        return "1", ()
+    if isinstance(roots, str):
+        roots = [roots]
+    where = list()
+    args = tuple()
+    for root in roots:
+        root = os.path.abspath(root)
+        prefix = os.path.join(root, "")
+        where.append("dir = ? OR substr(dir, 1, ?) = ?")
+        args += (root, len(prefix), prefix)
+    return "(" + " OR ".join(where) + ")", args
+
+
+def read_row(path, st):
+    """Read file and return catalog row(values for COLUMNS)."""
+    audio = SimpleMP3(path)
+    tags = dict()
+    for key, frame in TAGS.items():
+        tags[key] = str(audio.audio[frame]) if frame in audio.audio else None
+    apic = [[name, hashlib.sha256(data).hexdigest()] for name, data in audio.get_imgs()]
+    try:
+        duration = read_info(path).duration
+    except HeaderError:
+        duration = None
+    return (path, os.path.dirname(path), os.path.basename(path), st.st_dev, st.st_ino, st.st_size, st.st_mtime_ns,
+            tags["title"], tags["artist"], tags["album"], tags["year"], tags["number"], json.dumps(apic), duration,
+            None, None, time.time())
+
+
+class CatalogError(Exception):
+    """Error that is raised on unknown query."""
+    def __init__(self, value):
+        self.value = value
+
+
+if __name__ == "__main__":
+    import argparse
+    import datetime
+    import auto.img
+    import auto.keys
+    import auto.journal
+    import auto.storage
+
+    parser = argparse.ArgumentParser(prog="python -m auto.catalog", description="Library catalog.")
+    parser.add_argument("catalog", help="path to catalog database")
+    commands = parser.add_subparsers(dest="command", required=True)
+    rescan = commands.add_parser("rescan", help="bring catalog up to date")
+    rescan.add_argument("roots", nargs="+")
+    query = commands.add_parser("query", help="print paths of files which need tagging work")
+    query.add_argument("name", choices=QUERIES)
+    query.add_argument("--root", action="append", dest="roots")
+    query.add_argument("--since", help="date(YYYY-MM-DD) for changed-since")
+    query.add_argument("--img", default=os.path.join("auto", "auto tagger files", "imgs"),
+                       help="img associations file for missing-cover")
+    query.add_argument("--db", help="associations database for missing-cover, used instead of img associations "
+                                    "file(default is the application's database if it exists)")
+    options = parser.parse_args()
+    default_db = os.path.join("auto", "auto tagger files", "associations.db")
+
+    catalog = Catalog(options.catalog)
+    if options.command == "rescan":
+        catalog.rescan(options.roots)
+    else:
+        since = None
+        if options.since:
+            since = datetime.datetime.strptime(options.since, "%Y-%m-%d").timestamp()
+        assoc = None
+        index = None
+        if options.name == "missing-cover":
+            database = options.db
+            if database is None and os.path.isfile(default_db):
+                database = default_db
+            if database and not os.path.isfile(database):
+                parser.error("database not found: " + database)
+            if database:
+                assoc = auto.storage.SQLiteStore(database, read_only=True).associations("img")
+                index = auto.keys.AssociationIndex(assoc)
+            else:
+                assoc = auto.img.load_associations(options.img)
+                if isinstance(assoc, dict):
+                    assoc = auto.journal.replayed(assoc, options.img)
+                    index = auto.keys.AssociationIndex(assoc)
+        for path in catalog.query(options.name, roots=options.roots, since=since, assoc=assoc, index=index):
+            print(path)
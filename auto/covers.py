@@ -0,0 +1,411 @@
+"""Module that implement perceptual hashing of cover images, search of similar covers and bulk export of covers.
+
+Covers are compared by 64 bit difference hash(dHash): image is shrunk to 9x8 grayscale and every bit tells if pixel
+is brighter than its right neighbour, so the same cover saved at other size or quality gets the same or a close hash.
+Hashes are kept in BK-tree, which finds all hashes within given Hamming distance without comparing with every one.
+Flat(almost single colour) images all get hash 0, so they are matched only by sha256 of their data.
+
+export_covers writes every distinct embedded cover once, named by sha256 of its data, and CSV manifest with columns
+track, artist, name, sha256, image.
+"""
+
+
+from PIL import Image, ImageStat
+from mutagen import MutagenError
+from MP3.too_easy_mp3 import SimpleMP3
+from MP3.headers import read_text_frames
+from MP3.hash_func import file_sha256
+from auto.duplicates import walk_mp3
+from auto.img import add_association
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+import filetype
+import hashlib
+import threading
+import csv
+import io
+import os
+import os.path
+import sys
+
+
+HASH_SIZE = 8
+DISTANCE = 6
+FLAT_DEVIATION = 3
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".bmp", ".gif", ".webp")
+EXPORT_BATCH = 256
+MANIFEST_FIELDS = ("track", "artist", "name", "sha256", "image")
+
+
+def dhash(image, size=HASH_SIZE):
+    """Return difference hash(int of size * size bits) of PIL image."""
+    image = image.convert("L").resize((size + 1, size), Image.LANCZOS)
+    pixels = list(image.getdata())
+    value = 0
+    for row in range(size):
+        for col in range(size):
+            left = pixels[row * (size + 1) + col]
+            right = pixels[row * (size + 1) + col + 1]
+            value = (value << 1) | (left > right)
+    return value
+
+
+def is_flat(image, size=HASH_SIZE):
+    """Return True if PIL image has almost no contrast when it's shrunk for dhash, its hash is 0 whatever it shows."""
+    image = image.convert("L").resize((size + 1, size), Image.LANCZOS)
+    return ImageStat.Stat(image).stddev[0] < FLAT_DEVIATION
+
+
+def image_hash(path):
+    """Return difference hash of image file from path."""
+    with Image.open(path) as image:
+        return dhash(image)
+
+
+def data_hash(data):
+    """Return difference hash of image from bytes(e.g. APIC frame data)."""
+    with Image.open(io.BytesIO(data)) as image:
+        return dhash(image)
+
+
+def distance(a, b):
+    """Return Hamming distance between two hashes."""
+    return bin(a ^ b).count("1")
+
+
+class BKTree:
+    """Burkhard-Keller tree of hashes, metric is Hamming distance.
+
+    Every node is [hash, items, {distance: child}], search descends only into children whose distance to node could
+    contain hashes close enough to searched one.
+    """
+    def __init__(self):
+        self.root = None
+        self.size = 0
+
+    def add(self, value, item):
+        """Add item with hash value."""
+        self.size += 1
+        if self.root is None:
+            self.root = [value, [item], dict()]
+            return
+        node = self.root
+        while True:
+            dist = distance(value, node[0])
+            if dist == 0:
+                node[1].append(item)
+                return
+            if dist not in node[2]:
+                node[2][dist] = [value, [item], dict()]
+                return
+            node = node[2][dist]
+
+    def search(self, value, max_distance=DISTANCE):
+        """Return list of (distance, hash, items) of hashes within max_distance from value, closest first."""
+        res = list()
+        if self.root is None:
+            return res
+        stack = [self.root]
+        while stack:
+            node = stack.pop()
+            dist = distance(value, node[0])
+            if dist <= max_distance:
+                res.append((dist, node[0], node[1]))
+            for child_dist, child in node[2].items():
+                if dist - max_distance <= child_dist <= dist + max_distance:
+                    stack.append(child)
+        res.sort(key=lambda el: el[0])
+        return res
+
+    def __iter__(self):
+        """Yield (hash, items) of every node."""
+        stack = [self.root] if self.root else []
+        while stack:
+            node = stack.pop()
+            yield node[0], node[1]
+            stack.extend(node[2].values())
+
+    def __len__(self):
+        return self.size
+
+
+class CoverIndex:
+    """Index of image files by perceptual hash.  Hashes of files are cached by path, size and modification time.
+    Flat images are indexed by sha256 of file instead, only exact copies of them are grouped.
+    """
+    def __init__(self, max_distance=DISTANCE):
+        """
+        Construct a new 'CoverIndex' object.
+
+        :param max_distance: maximum Hamming distance between hashes of images which are considered the same.
+        :return returns nothing.
+        """
+        self.max_distance = max_distance
+        self.tree = BKTree()
+        self.hashes = dict()
+        self.flat = dict()
+
+    def hash_file(self, path):
+        """Return hash of image file or None if it isn't a readable image."""
+        try:
+            st = os.stat(path)
+        except OSError:
+            return None
+        cached = self.hashes.get(path)
+        if cached and cached[0] == (st.st_size, st.st_mtime_ns):
+            return cached[1]
+        try:
+            with Image.open(path) as image:
+                value, flat = dhash(image), is_flat(image)
+        except (OSError, ValueError):
+            value, flat = None, False
+        self.hashes[path] = ((st.st_size, st.st_mtime_ns), value, flat)
+        return value
+
+    def add_file(self, path):
+        """Add image file to index, return its hash or None."""
+        value = self.hash_file(path)
+        if value is None:
+            return None
+        if self.hashes[path][2]:
+            try:
+                self.flat.setdefault(file_sha256(path), list()).append(path)
+            except OSError:
+                return None
+        else:
+            self.tree.add(value, path)
+        return value
+
+    def add_directory(self, path):
+        """Add all images from directory."""
+        for el in sorted(os.listdir(path)):
+            if el.lower().endswith(IMAGE_EXTENSIONS):
+                self.add_file(os.path.join(path, el))
+
+    def similar(self, value):
+        """Return paths of indexed images close to hash value, closest first."""
+        return [path for dist, hash_, paths in self.tree.search(value, self.max_distance) for path in paths]
+
+    def groups(self):
+        """Return list of lists of paths to images which are near duplicates of each other."""
+        res = list()
+        seen = set()
+        for value, paths in self.tree:
+            if paths[0] in seen:
+                continue
+            group = [path for path in self.similar(value) if path not in seen]
+            seen.update(group)
+            if len(group) > 1:
+                res.append(group)
+        res.extend(paths for paths in self.flat.values() if len(paths) > 1)
+        return res
+
+
+def choose_cover(paths):
+    """Return path to image with the biggest resolution, bigger file wins ties."""
+    def quality(path):
+        try:
+            with Image.open(path) as image:
+                pixels = image.size[0] * image.size[1]
+        except (OSError, ValueError):
+            pixels = 0
+        try:
+            size = os.path.getsize(path)
+        except OSError:
+            size = 0
+        return pixels, size
+    return max(paths, key=quality)
+
+
+def dedupe_images(assoc, path, max_distance=DISTANCE, delete=False, file=sys.stdout):
+    """Find near duplicate images in directory, point associations to the best copy of each image.
+
+    OPTIONS
+        max_distance: int
+            Maximum Hamming distance between hashes of images which are considered the same.
+        delete: boolean
+            If this option is True other copies are deleted.
+        file: object
+            File-like object (stream); defaults to the current sys.stdout.
+
+    Return dict {path to replaced copy: path to kept image}.
+    """
+    index = CoverIndex(max_distance)
+    index.add_directory(path)
+    replaced = dict()
+    for group in index.groups():
+        keeper = choose_cover(group)
+        for el in group:
+            if el != keeper:
+                replaced[el] = keeper
+                print("[Info]Same cover: " + el + " -> " + keeper, file=file)
+
+    targets = {os.path.normcase(os.path.abspath(el)): keeper for el, keeper in replaced.items()}
+    for artist in assoc:
+        images = assoc[artist]
+        for key in list(images):
+            keeper = targets.get(os.path.normcase(os.path.abspath(images[key])))
+            if keeper:
+                images[key] = keeper
+
+    if delete:
+        for el in replaced:
+            try:
+                os.remove(el)
+            except OSError as e:
+                print("[Error]Failed to delete " + el + ": " + str(e), file=file)
+    return replaced
+
+
+def find_mismatches(assoc, roots, max_distance=DISTANCE, index=None, file=sys.stdout):
+    """Yield (path, association name, distance) for tracks whose embedded cover differs from associated image.
+
+    Distance is None when track has no cover with association name.  Tracks of artists without associations and
+    associations with unreadable images are skipped.
+
+    OPTIONS
+        max_distance: int
+            Maximum Hamming distance between hashes of images which are considered the same.
+        index: auto.keys.AssociationIndex
+            Index of assoc, used to find artist written with different case or whitespace.
+        file: object
+            File-like object (stream); defaults to the current sys.stdout.
+    """
+    covers = CoverIndex(max_distance)
+    for path, st in walk_mp3(roots):
+        try:
+            artist = read_text_frames(path, frames=("TPE1",)).get("TPE1", "").rstrip()
+        except OSError:
+            continue
+        if index:
+            artist = index.artist(artist) or artist
+        if artist not in assoc:
+            continue
+        images = assoc[artist]
+        try:
+            embedded = dict(SimpleMP3(path).get_imgs())
+        except (MutagenError, OSError) as e:
+            print("[Error]Failed to read " + path + ": " + str(e), file=file)
+            continue
+        for key in images:
+            expected = covers.hash_file(images[key])
+            if expected is None:
+                continue
+            if key not in embedded:
+                yield path, key, None
+                continue
+            try:
+                dist = distance(expected, data_hash(embedded[key]))
+            except (OSError, ValueError):
+                dist = None
+            if dist is None or dist > max_distance:
+                yield path, key, dist
+
+
+def export_covers(roots, destination, manifest=None, workers=8, file=sys.stdout):
+    """Write every distinct cover embedded in mp3 files from roots to destination directory.
+
+    Files are read by a pool of threads, each cover is written once to '<sha256>.<extension>', so the same cover
+    embedded in many tracks takes place of one file and exporting to the same directory again writes only new
+    covers.
+
+    OPTIONS
+        manifest: str
+            Path to CSV file which maps tracks to their covers, defaults to manifest.csv in destination.
+        workers: int
+            Number of threads which read tracks and write covers.
+        file: object
+            File-like object (stream); defaults to the current sys.stdout.
+
+    Return dict with numbers of 'tracks', 'covers'(embedded in tracks) and 'written' images.
+    """
+    os.makedirs(destination, exist_ok=True)
+    if manifest is None:
+        manifest = os.path.join(destination, "manifest.csv")
+    summary = dict(tracks=0, covers=0, written=0)
+    paths = (path for path, st in walk_mp3(roots))
+    claimed = _Claims()
+    with open(manifest, "w", encoding="utf8", newline="") as out, ThreadPoolExecutor(max_workers=workers) as executor:
+        writer = csv.writer(out)
+        writer.writerow(MANIFEST_FIELDS)
+        while True:
+            batch = list(islice(paths, EXPORT_BATCH))
+            if not batch:
+                break
+            for path, artist, covers, error in executor.map(lambda el: _export_track(el, destination, claimed),
+                                                            batch):
+                if error:
+                    print("[Error]Failed to read " + path + ": " + error, file=file)
+                summary["tracks"] += 1
+                for name, digest, image, written in covers:
+                    summary["covers"] += 1
+                    summary["written"] += written
+                    writer.writerow((path, artist, name, digest, image))
+    print("[Info]{written} covers written from {covers} covers of {tracks} tracks.".format(**summary), file=file)
+    return summary
+
+
+def _export_track(path, destination, claimed):
+    """Return (path, artist, [(name, sha256, image file name, 1 if file was written else 0)], error message or
+    None) of track.  It's called in worker threads, so errors are returned instead of printed.
+    """
+    try:
+        audio = SimpleMP3(path)
+        artist = str(audio["artist"] or "")
+        images = audio.get_imgs()
+    except (MutagenError, OSError) as e:
+        return path, "", [], str(e)
+    res = list()
+    for name, data in images:
+        digest = hashlib.sha256(data).hexdigest()
+        kind = filetype.guess(data)
+        image = digest + "." + (kind.extension if kind else "bin")
+        written = _write_once(os.path.join(destination, image), data) if claimed.claim(digest) else 0
+        res.append((name, digest, image, written))
+    return path, artist, res, None
+
+
+class _Claims:
+    """Thread-safe set of digests, only the first thread which claims digest writes its image."""
+    def __init__(self):
+        self.digests = set()
+        self.lock = threading.Lock()
+
+    def claim(self, digest):
+        with self.lock:
+            if digest in self.digests:
+                return False
+            self.digests.add(digest)
+            return True
+
+
+def _write_once(path, data):
+    """Write data to path if it doesn't exist, return 1 if file was written."""
+    if os.path.exists(path):
+        return 0
+    temp = "{}.{}.tmp".format(path, threading.get_ident())
+    with open(temp, "wb") as file:
+        file.write(data)
+    os.replace(temp, path)
+    return 1
+
+
+def associate_manifest(assoc, manifest, destination, index=None):
+    """Update assoc dict with associations of every artist to his most frequent cover of each name from manifest.
+
+    OPTIONS
+        index: auto.keys.AssociationIndex
+            Index of assoc, see auto.img.add_association.
+
+    Return number of added associations.
+    """
+    counts = dict()
+    with open(manifest, encoding="utf8", newline="") as file:
+        for row in csv.DictReader(file):
+            if row["artist"]:
+                images = counts.setdefault((row["artist"], row["name"]), dict())
+                images[row["image"]] = images.get(row["image"], 0) + 1
+    for (artist, name), images in counts.items():
+        image = max(images, key=images.get)
+        add_association(assoc, artist, img=os.path.join(destination, image), assoc_name=name, index=index)
+    return len(counts)
@@ -1,6 +1,17 @@
 import os
 import os.path
-from MP3.hash_func import file_sha256 as hash
+import sys
+import json
+import re
+import shutil
+from MP3.hash_func import file_sha256 as hash, file_head_sha256, HEAD_SIZE
+from MP3.too_easy_mp3 import SimpleMP3
+from mutagen import MutagenError
+import auto.name
+
+
+policies = ("tagged", "newest", "oldest")
+actions = ("link", "delete", "move")
 
 
 def find_duplicates(path, mutex=None):
@@ -98,6 +109,503 @@ def find_duplicates(path, mutex=None):
             mutex.release()
 
 
+def walk_mp3(roots):
+    """Yield (path, stat) for every mp3 file in roots and all their subdirectories.
+
+    Symbolic links are not followed and directory visited twice (overlapping roots, bind mounts) is skipped,
+    so every path is yielded once.
+    """
+    if isinstance(roots, str):
+        roots = [roots]
+    seen_dirs = set()
+    stack = list()
+    for root in roots:
+        if not os.path.isdir(root):
+            raise SearchError("No such directory " + root)
+        stack.append(os.path.normpath(root))
+
+    while stack:
+        dir_ = stack.pop()
+        try:
+            st = os.stat(dir_)
+        except OSError:
+            continue
+        if (st.st_dev, st.st_ino) in seen_dirs:
+            continue
+        seen_dirs.add((st.st_dev, st.st_ino))
+        try:
+            entries = list(os.scandir(dir_))
+        except OSError:
+            continue
+        for entry in entries:
+            try:
+                if entry.is_dir(follow_symlinks=False):
+                    stack.append(entry.path)
+                elif entry.name.endswith(".mp3") and entry.is_file(follow_symlinks=False):
+                    yield entry.path, entry.stat(follow_symlinks=False)
+            except OSError:
+                pass
+
+
+class DuplicateGroup:
+    """Set of files with identical content.
+
+    files contain one path per distinct inode, links map each of them to the other paths which are hardlinks
+    to the same inode. Hardlinks don't take extra space so only files are counted in reclaimable.
+    """
+    def __init__(self, digest, size, files, links):
+        self.hash = digest
+        self.size = size
+        self.files = files
+        self.links = links
+
+    @property
+    def reclaimable(self):
+        """Bytes which would be freed by keeping only one copy."""
+        return self.size * (len(self.files) - 1)
+
+    def __repr__(self):
+        return "DuplicateGroup({}, {}, {})".format(self.hash, self.size, self.files)
+
+
+class LibraryScan:
+    """Search duplicates across several root directories in one pass.
+
+    Iterate over object to get DuplicateGroup objects, they are yielded as soon as their size bucket is hashed.
+    Files are grouped by (device, inode) first, hardlinked files are never hashed twice and reported in hardlinks
+    attribute.  After iteration files, groups and reclaimable attributes contain totals.
+    """
+    def __init__(self, roots, file=sys.stdout, catalog=None):
+        """
+        Construct a new 'LibraryScan' object.
+
+        :param roots: path or list of paths to directories which should be scanned.
+        :param file: file-like object to redirect output.
+        :param catalog: auto.catalog.Catalog, hashes of unchanged files are taken from it instead of hashing them.
+        :return returns nothing.
+        """
+        if isinstance(roots, str):
+            roots = [roots]
+        self.roots = roots
+        self.file = file
+        self.catalog = catalog
+        self.files = 0
+        self.groups = 0
+        self.reclaimable = 0
+        self.hardlinks = list()
+
+    def __iter__(self):
+        sizes = dict()
+        for path, st in walk_mp3(self.roots):
+            self.files += 1
+            if st.st_size == 0:
+                continue
+            inodes = sizes.setdefault(st.st_size, dict())
+            inodes.setdefault((st.st_dev, st.st_ino), list()).append(path)
+
+        print("Checking complete: {} files".format(self.files), file=self.file)
+
+        for size in sorted(sizes, reverse=True):
+            inodes = sizes[size]
+            for paths in inodes.values():
+                if len(paths) > 1:
+                    self.hardlinks.append(paths)
+            if len(inodes) < 2:
+                continue
+
+            for group in self._hash_bucket(size, inodes):
+                self.groups += 1
+                self.reclaimable += group.reclaimable
+                yield group
+
+        print("Search complete: {} groups, {} bytes reclaimable".format(self.groups, self.reclaimable),
+              file=self.file)
+
+    def _hash_bucket(self, size, inodes):
+        """Split files of one size into groups of identical content, hashing head of file before whole file."""
+        heads = dict()
+        for paths in inodes.values():
+            try:
+                heads.setdefault(self._hash(paths[0], head=True), list()).append(paths)
+            except OSError:
+                pass
+
+        for head, candidates in heads.items():
+            if len(candidates) < 2:
+                continue
+            if size <= HEAD_SIZE:
+                digests = {head: candidates}
+            else:
+                digests = dict()
+                for paths in candidates:
+                    try:
+                        digests.setdefault(self._hash(paths[0]), list()).append(paths)
+                    except OSError:
+                        pass
+            for digest, same in digests.items():
+                if len(same) < 2:
+                    continue
+                files = [paths[0] for paths in same]
+                links = {paths[0]: paths[1:] for paths in same if len(paths) > 1}
+                yield DuplicateGroup(digest, size, files, links)
+
+    def _hash(self, path, head=False):
+        if self.catalog:
+            return self.catalog.file_hash(path, head=head)
+        return file_head_sha256(path) if head else hash(path)
+
+
+def tag_score(path):
+    """Return number of supported tags which are set in file, APIC counts once."""
+    audio = SimpleMP3(path)
+    score = 0
+    for k in audio:
+        if audio[k] and str(audio[k]).strip():
+            score += 1
+    if audio.get_tag_list()[-2]:
+        score += 1
+    return score
+
+
+def choose_keeper(group, policy="tagged"):
+    """Return path from group.files which should be kept according to policy.
+
+    OPTIONS
+        policy: str
+            'tagged' keep file with most tags set (newest one on tie), 'newest' or 'oldest' use modification time.
+    """
+    if policy not in policies:
+        raise ResolveError("Unknown policy " + policy)
+
+    mtimes = {path: os.path.getmtime(path) for path in group.files}
+    if policy == "newest":
+        return max(group.files, key=lambda path: mtimes[path])
+    elif policy == "oldest":
+        return min(group.files, key=lambda path: mtimes[path])
+    scores = dict()
+    for path in group.files:
+        try:
+            scores[path] = tag_score(path)
+        except (OSError, MutagenError):
+            scores[path] = -1
+    return max(group.files, key=lambda path: (scores[path], mtimes[path]))
+
+
+def read_journal(path):
+    """Return set of (action, path) pairs already completed according to journal file from path."""
+    done = set()
+    try:
+        with open(path, "r", encoding="utf8") as journal:
+            for line in journal:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue
+                if record.get("state") == "done":
+                    done.add((record["action"], record["path"]))
+    except FileNotFoundError:
+        pass
+    return done
+
+
+def resolve_duplicates(groups, policy="tagged", action="link", quarantine=None, journal=None, dry_run=False,
+                       batch_size=100, file=sys.stdout):
+    """Apply action to every redundant copy in groups(iterable of DuplicateGroup, e.g. LibraryScan object) and
+    return summary dict with 'groups', 'files', 'reclaimed' and 'errors' counters.
+
+    OPTIONS
+        policy: str
+            Rule used to choose copy which is kept, see choose_keeper.
+        action: str
+            'link' replace copy with hardlink to kept file, 'delete' remove copy, 'move' move copy to quarantine.
+        quarantine: str
+            Directory for moved copies, required by 'move' action.
+        journal: str
+            Path to journal file.  Every planned and completed operation is appended to it batch by batch, actions
+            which are already done according to journal are skipped so interrupted run can be restarted.
+        dry_run: boolean
+            If this option is True only print what would be done.
+        batch_size: int
+            Number of groups planned and flushed to journal at once.
+        file: object
+            File-like object (stream); defaults to the current sys.stdout.
+    """
+    if action not in actions:
+        raise ResolveError("Unknown action " + action)
+    if action == "move" and not quarantine:
+        raise ResolveError("Quarantine directory is required by move action")
+
+    summary = {"groups": 0, "files": 0, "reclaimed": 0, "errors": 0}
+    done = read_journal(journal) if journal and not dry_run else set()
+    out = None
+    if journal and not dry_run:
+        out = open(journal, "a", encoding="utf8")
+
+    try:
+        batch = list()
+        for group in groups:
+            batch.append(group)
+            if len(batch) >= batch_size:
+                _resolve_batch(batch, policy, action, quarantine, out, done, dry_run, summary, file)
+                batch = list()
+        if batch:
+            _resolve_batch(batch, policy, action, quarantine, out, done, dry_run, summary, file)
+    finally:
+        if out:
+            out.close()
+
+    print("[Info]{}: {} groups, {} files, {} bytes reclaimed, {} errors".format(
+        "Dry run" if dry_run else "Done", summary["groups"], summary["files"], summary["reclaimed"],
+        summary["errors"]), file=file)
+    return summary
+
+
+def _plan(group, policy, action, quarantine):
+    """Return list of operation records for one group.  Hardlink can't cross devices, so for link action keeper is
+    chosen on every device separately.
+    """
+    if action == "link":
+        devices = dict()
+        for path in group.files:
+            devices.setdefault(os.stat(path).st_dev, list()).append(path)
+        keepers = dict()
+        for files in devices.values():
+            keep = choose_keeper(DuplicateGroup(group.hash, group.size, files, group.links), policy)
+            keepers.update(dict.fromkeys(files, keep))
+    else:
+        keepers = dict.fromkeys(group.files, choose_keeper(group, policy))
+    records = list()
+    for i, path in enumerate(group.files):
+        keep = keepers[path]
+        if path == keep:
+            continue
+        for j, alias in enumerate([path] + group.links.get(path, list())):
+            record = {"action": action, "path": alias, "keep": keep, "hash": group.hash, "size": group.size,
+                      "mtime_ns": os.stat(alias).st_mtime_ns, "state": "planned", "counted": j == 0}
+            if action == "move":
+                name = "{}_{}_{}_{}".format(group.hash[:16], i, j, os.path.basename(alias))
+                record["target"] = os.path.join(quarantine, name)
+            records.append(record)
+    return records
+
+
+def _resolve_batch(batch, policy, action, quarantine, journal, done, dry_run, summary, file):
+    """Plan batch of groups, write plan to journal, perform operations and mark them done."""
+    plan = list()
+    for group in batch:
+        try:
+            records = _plan(group, policy, action, quarantine)
+        except OSError as e:
+            print("[Error]Failed to resolve group {}: {}".format(group.hash, e), file=file)
+            summary["errors"] += 1
+            continue
+        summary["groups"] += 1
+        plan.extend(record for record in records if (record["action"], record["path"]) not in done)
+
+    if journal:
+        _write_records(journal, plan)
+
+    completed = list()
+    for record in plan:
+        if dry_run:
+            print("{} {} (keep {})".format(record["action"], record["path"], record["keep"]), file=file)
+        else:
+            try:
+                _perform(record)
+            except OSError as e:
+                print("[Error]Failed to {} {}: {}".format(record["action"], record["path"], e), file=file)
+                summary["errors"] += 1
+                continue
+            completed.append(dict(record, state="done"))
+        summary["files"] += 1
+        if record["counted"]:
+            summary["reclaimed"] += record["size"]
+
+    if journal:
+        _write_records(journal, completed)
+
+
+def _write_records(journal, records):
+    """Append records to journal and flush them to disk."""
+    for record in records:
+        journal.write(json.dumps(record) + "\n")
+    journal.flush()
+    os.fsync(journal.fileno())
+
+
+def _perform(record):
+    """Perform one planned operation.  File is checked by size, modification time and content hash first, so file
+    rewritten since it was planned isn't touched.
+    """
+    path = record["path"]
+    st = os.stat(path)
+    if st.st_size != record["size"] or st.st_mtime_ns != record.get("mtime_ns", st.st_mtime_ns):
+        raise OSError("file changed since scan")
+    if hash(path) != record["hash"]:
+        raise OSError("file content changed since scan")
+    if record["action"] == "link":
+        temp = path + ".link"
+        os.link(record["keep"], temp)
+        try:
+            os.replace(temp, path)
+        except OSError:
+            os.remove(temp)
+            raise
+    elif record["action"] == "delete":
+        os.remove(path)
+    elif record["action"] == "move":
+        os.makedirs(os.path.dirname(record["target"]), exist_ok=True)
+        shutil.move(path, record["target"])
+
+
+class NearDuplicateIndex:
+    """Index of tracks by normalized (artist, title) key and duration bucket.
+
+    Key is casefolded, ban list terms and punctuation are removed, so the same song encoded twice or saved with
+    different junk in tags gets the same key.  Durations are split into buckets of tolerance seconds, tracks with
+    durations which differ less than tolerance are reported as likely duplicates.
+    """
+    def __init__(self, ban_list=None, tolerance=3):
+        """
+        Construct a new 'NearDuplicateIndex' object.
+
+        :param ban_list: list of banned words/symbols or path to ban list file.
+        :param tolerance: maximum difference of durations in seconds.
+        :return returns nothing.
+        """
+        if isinstance(ban_list, str):
+            ban_list = auto.name.form_ban_list(ban_list)
+        terms = sorted({el.casefold() for el in ban_list or list() if el.strip()}, key=len, reverse=True)
+        self.ban_pattern = re.compile("|".join(re.escape(el) for el in terms)) if terms else None
+        self.tolerance = tolerance
+        self.buckets = dict()
+        self.keys = dict()
+
+    def normalize(self, text):
+        """Return text casefolded, without ban list terms, punctuation and repeated whitespace."""
+        text = str(text).casefold()
+        if self.ban_pattern:
+            text = self.ban_pattern.sub(" ", text)
+        text = _punctuation.sub(" ", text)
+        return " ".join(text.split())
+
+    def key(self, artist, title):
+        """Return normalized (artist, title) key."""
+        return self.normalize(artist), self.normalize(title)
+
+    def bucket(self, duration):
+        """Return bucket number of duration in seconds or None when duration is unknown."""
+        if duration is None:
+            return None
+        return int(duration // self.tolerance)
+
+    def add(self, path, artist, title, duration=None):
+        """Add track to index."""
+        key = self.key(artist, title)
+        if not any(key):
+            return
+        bucket = self.bucket(duration)
+        self.buckets.setdefault(key + (bucket,), list()).append((path, duration))
+        self.keys.setdefault(key, set()).add(bucket)
+
+    def add_file(self, path):
+        """Add mp3 file to index reading artist and title from its tags and duration from MPEG headers."""
+        audio = SimpleMP3(path)
+        self.add(path, audio["artist"] or "", audio["title"] or "", duration=_tag_duration(audio))
+
+    def candidates(self, artist, title, duration=None):
+        """Return list of indexed paths which are likely duplicates of track with given tags."""
+        key = self.key(artist, title)
+        bucket = self.bucket(duration)
+        if bucket is None:
+            buckets = self.keys.get(key, set())
+        else:
+            buckets = (bucket - 1, bucket, bucket + 1, None)
+        res = list()
+        for el in buckets:
+            for path, other in self.buckets.get(key + (el,), list()):
+                if duration is None or other is None or abs(duration - other) <= self.tolerance:
+                    res.append(path)
+        return res
+
+    def groups(self):
+        """Yield lists of paths which are likely duplicates.
+
+        Tracks with the same key are sorted by duration, group is started by the shortest track which isn't grouped
+        yet and takes tracks at most tolerance longer than it, so every two tracks of group match(matches aren't
+        chained).  Tracks with unknown duration join the first group of their key.
+        """
+        for key, buckets in self.keys.items():
+            known = list()
+            unknown = list()
+            for bucket in buckets:
+                if bucket is None:
+                    unknown.extend(path for path, duration in self.buckets[key + (bucket,)])
+                else:
+                    known.extend(self.buckets[key + (bucket,)])
+            if len(known) + len(unknown) < 2:
+                continue
+
+            clusters = list()
+            start = None
+            for path, duration in sorted(known, key=lambda el: el[1]):
+                if start is None or duration - start > self.tolerance:
+                    clusters.append(list())
+                    start = duration
+                clusters[-1].append(path)
+            if clusters:
+                clusters[0].extend(unknown)
+            else:
+                clusters.append(unknown)
+
+            for cluster in clusters:
+                if len(cluster) > 1:
+                    yield cluster
+
+
+def find_near_duplicates(roots, ban_list=None, tolerance=3, file=sys.stdout):
+    """Build NearDuplicateIndex from tags of all mp3 files in roots and return it.
+
+    OPTIONS
+        ban_list: list or str
+            List of banned words/symbols or path to ban list file, used to normalize tags.
+        tolerance: int
+            Maximum difference of durations in seconds.
+        file: object
+            File-like object (stream); defaults to the current sys.stdout.
+    """
+    index = NearDuplicateIndex(ban_list=ban_list, tolerance=tolerance)
+    count = 0
+    for path, st in walk_mp3(roots):
+        try:
+            index.add_file(path)
+            count += 1
+        except (OSError, MutagenError):
+            print("[Error]Failed to read tags: " + path, file=file)
+    print("[Info]Indexed {} files".format(count), file=file)
+    return index
+
+
+def _tag_duration(audio):
+    """Return duration in seconds read from MPEG headers, from TLEN tag when headers are broken, or None."""
+    duration = audio.get_duration()
+    if duration is not None:
+        return duration
+    try:
+        return int(str(audio.audio["TLEN"])) / 1000
+    except (KeyError, ValueError):
+        return None
+
+
+_punctuation = re.compile(r"[^\w\s]|_")
+
+
+class ResolveError(Exception):
+    """Error that is raised on wrong resolution options."""
+    def __init__(self, value):
+        self.value = value
+
+
 class SearchError(Exception):
     def __init__(self, value):
         self.value = value
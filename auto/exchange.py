@@ -0,0 +1,130 @@
+"""Module that implement streaming import and export of associations dicts as CSV or JSON lines files.
+
+Files hold one association per row, so they are read and written row by row whatever their size.  Format is chosen
+by file extension: '.jsonl' for JSON lines, anything else for CSV.  Columns:
+    img:   artist, name, img
+    album: artist, title, album
+CSV files start with header row, JSON lines are objects with the same keys.
+
+Import merges every row into existing associations of artist instead of replacing all of them.  Row which gives
+other value to existing association is a conflict, it's reported and existing value is kept unless replace is True.
+"""
+
+
+import csv
+import json
+import sys
+
+
+FIELDS = {"img": ("artist", "name", "img"), "album": ("artist", "title", "album")}
+CONFLICT_REPORT = 20
+
+
+def is_jsonl(path):
+    return path.lower().endswith((".jsonl", ".ndjson"))
+
+
+def export_associations(assoc, path, assoc_type):
+    """Write associations dict({"author": {key: value}}) to path, return number of written rows."""
+    fields = FIELDS[assoc_type]
+    count = 0
+    with open(path, "w", encoding="utf8", newline="") as file:
+        if is_jsonl(path):
+            for artist, key, value in _rows(assoc):
+                file.write(json.dumps(dict(zip(fields, (artist, key, value))), ensure_ascii=False) + "\n")
+                count += 1
+        else:
+            writer = csv.writer(file)
+            writer.writerow(fields)
+            for row in _rows(assoc):
+                writer.writerow(row)
+                count += 1
+    return count
+
+
+def _rows(assoc):
+    for artist in assoc:
+        titles = assoc[artist]
+        for key in titles:
+            yield artist, key, titles[key]
+
+
+def read_rows(path, assoc_type):
+    """Yield (artist, key, value) rows from file in path.
+
+    Raise ExchangeError on row without required columns.
+    """
+    fields = FIELDS[assoc_type]
+    with open(path, encoding="utf8", newline="") as file:
+        if is_jsonl(path):
+            rows = (json.loads(line) for line in file if line.strip())
+        else:
+            rows = csv.DictReader(file)
+        for line, row in enumerate(rows, 1):
+            try:
+                values = tuple(row[el] for el in fields)
+            except (KeyError, TypeError):
+                values = (None,)
+            if None in values:
+                raise ExchangeError("Row {} of {} has no {} columns".format(line, path, ", ".join(fields)))
+            yield tuple(str(el) for el in values)
+
+
+def import_associations(assoc, path, assoc_type, replace=False, index=None, summary=None, file=sys.stdout):
+    """Merge associations from file in path into assoc dict.
+
+    OPTIONS
+        replace: boolean
+            If this option is True conflicting rows replace existing associations.
+        index: auto.keys.AssociationIndex
+            Index of assoc, artists and keys which differ from existing ones only in case or whitespace are merged
+            with them.
+        summary: dict
+            Counters which are updated in place, so caller knows how many rows were applied when import is
+            interrupted by error.
+        file: object
+            File-like object (stream) conflicts are reported to; defaults to the current sys.stdout.
+
+    Return dict with numbers of 'added', 'unchanged', 'replaced' and 'conflicts' rows.
+    """
+    if summary is None:
+        summary = new_summary()
+    for artist, key, value in read_rows(path, assoc_type):
+        if index:
+            artist = index.artist(artist, fuzzy=False) or artist
+            if artist in assoc:
+                key = index.title(artist, key, fuzzy=False) or key
+        if artist not in assoc:
+            assoc[artist] = dict()
+        titles = assoc[artist]
+        old = titles.get(key)
+        if old is None:
+            titles[key] = value
+            summary["added"] += 1
+        elif old == value:
+            summary["unchanged"] += 1
+            continue
+        else:
+            summary["conflicts"] += 1
+            if summary["conflicts"] <= CONFLICT_REPORT:
+                print("[Error]Conflict: {} - {} - {} / {}".format(artist, key, old, value), file=file)
+            if not replace:
+                continue
+            titles[key] = value
+            summary["replaced"] += 1
+        if index:
+            index.add(artist, key)
+    if summary["conflicts"] > CONFLICT_REPORT:
+        print("[Error]... and {} more conflicts.".format(summary["conflicts"] - CONFLICT_REPORT), file=file)
+    return summary
+
+
+def new_summary():
+    """Return import counters set to zero."""
+    return dict(added=0, unchanged=0, replaced=0, conflicts=0)
+
+
+class ExchangeError(Exception):
+    """Error that is raised on malformed import file."""
+    def __init__(self, value):
+        self.value = value
@@ -7,6 +7,7 @@ Structure of associations dict:
 
 
 from MP3.too_easy_mp3 import SimpleMP3, TagError
+from auto.snapshot import Snapshot, is_snapshot
 import pickle
 import os.path
 import os
@@ -14,32 +15,47 @@ from os import sep
 import sys
 
 
-def auto(file, associations, replace=True):
+def auto(file, associations, replace=True, index=None):
     """Set APIC tag to file using established associations which given by associations argument.
     This function need already established artist tag in file.
 
     OPTIONS
         replace: boolean
             If this option is False set APIC tag only if that tag isn't exist.
+        index: auto.keys.AssociationIndex
+            Index of associations, used to find artist written with different case or whitespace.
+
+    Return True if file was changed, APIC which already has image of association isn't written again.
     """
     audio = SimpleMP3(file)
     artist = str(audio["artist"]).rstrip()
+    if index:
+        artist = index.artist(artist) or artist
     if artist in associations:
-        if replace:
-            for key in associations[artist]:
-                audio.set_img(associations[artist][key], key)
-        else:
-            for key in associations[artist]:
-                try:
-                    audio.get_img(f'..{sep}temp', img=key)
-                except TagError:
-                    audio.set_img(associations[artist][key], key)
+        changed = False
+        for key in associations[artist]:
+            try:
+                current = audio.get_img_data(key)
+            except TagError:
+                current = None
+            if current is not None and not replace:
+                continue
+            with open(associations[artist][key], "rb") as image:
+                if image.read() == current:
+                    continue
+            audio.set_img(associations[artist][key], key)
+            changed = True
+        return changed
     else:
         raise FormatError("No img associations for file " + file)
 
 
 def load_associations(path):
-    """Return dict of associations deserialized from path."""
+    """Return dict of associations deserialized from path, or read-only auto.snapshot.Snapshot if path is a
+    snapshot file.
+    """
+    if is_snapshot(path):
+        return Snapshot(path)
     with open(path, "rb") as file:
         associations = pickle.load(file)
     return associations
@@ -51,7 +67,7 @@ def save_associations(assoc, path):
         pickle.dump(assoc, file)
 
 
-def add_association(assoc, author, img="", assoc_name=""):
+def add_association(assoc, author, img="", assoc_name="", index=None):
     """Update assoc dict with new association.
 
     OPTIONS
@@ -59,13 +75,19 @@ def add_association(assoc, author, img="", assoc_name=""):
             Path to img file.
         assoc_name: str
             Name which be written after APIC: in tag.
+        index: auto.keys.AssociationIndex
+            Index of assoc, artist which differs from existing one only in case or whitespace is merged with it.
     """
+    if index:
+        author = index.artist(author, fuzzy=False) or author
     if author not in assoc:
         assoc[author] = dict()
     assoc[author][assoc_name] = img
+    if index:
+        index.add(author)
 
 
-def associate(assoc, path, typ="", file=sys.stdout):
+def associate(assoc, path, typ="", file=sys.stdout, index=None):
     """Update assoc with associated img to authors using file names, it will associate all files in directory
      so be careful.
 
@@ -74,6 +96,8 @@ def associate(assoc, path, typ="", file=sys.stdout):
             Name which be written after APIC: in tag, synonym to assoc_name.
         file: object
             File-like object (stream); defaults to the current sys.stdout.
+        index: auto.keys.AssociationIndex
+            Index of assoc, see add_association.
      """
     out = file
     for el in os.listdir(path):
@@ -84,19 +108,23 @@ def associate(assoc, path, typ="", file=sys.stdout):
             for i in range(len(file)-1):
                 author += (file[i])
             img = el_path
-            add_association(assoc, author, img, assoc_name=typ)
+            add_association(assoc, author, img, assoc_name=typ, index=index)
             print("association added" + " - " + author + " - " + img + " - " + typ, file=out)
         else:
             pass
 
 
-def del_association(assoc, author, assoc_name=""):
+def del_association(assoc, author, assoc_name="", index=None):
     """Delete association from assoc.
 
     OPTIONS
         assoc_name: str
             Name which be written after APIC: in tag.
+        index: auto.keys.AssociationIndex
+            Index of assoc, used to find artist written with different case or whitespace.
     """
+    if index:
+        author = index.artist(author, fuzzy=False) or author
     del(assoc[author][assoc_name])
 
 
@@ -0,0 +1,180 @@
+"""Module that implement append-only journal of changes made in associations dicts.
+
+JournaledAssociations wraps associations dict loaded from pickle file and keeps every change made through it as an
+operation.  save appends pending operations to journal file(path + '.journal') as JSON lines and fsyncs it, so saving
+costs as much as the changes and not as the whole dict.  When journal outgrows base file it's compacted: dict is
+pickled to temporary file which replaces base file, then journal is truncated.  On construction journal is replayed
+on top of dict loaded from base file, a line torn by crash is dropped.
+
+Operations:
+    ["set", artist, key, value], ["del", artist, key], ["put", artist, {key: value}], ["drop", artist], ["clear"]
+"""
+
+
+from collections.abc import MutableMapping
+import pickle
+import json
+import os
+
+
+SUFFIX = ".journal"
+COMPACT_SIZE = 256 * 1024
+
+
+class JournaledAssociations(MutableMapping):
+    """Associations dict({"author": {key: value}}) which changes are saved to append-only journal."""
+    def __init__(self, data, path, compact_size=COMPACT_SIZE):
+        """
+        Construct a new 'JournaledAssociations' object and replay journal of path on top of data.
+
+        :param data: associations dict loaded from base file.
+        :param path: path to base file, journal is placed next to it.
+        :param compact_size: journal is compacted when it's bigger than this size and base file.
+        :return returns nothing.
+        """
+        self.data = data
+        self.path = path
+        self.journal_path = path + SUFFIX
+        self.compact_size = compact_size
+        self.pending = list()
+        self.replay()
+
+    def replay(self):
+        """Apply operations from journal to dict, cut off torn tail of journal."""
+        try:
+            file = open(self.journal_path, "r+b")
+        except FileNotFoundError:
+            return
+        with file:
+            file.truncate(_replay(self.data, file))
+
+    def log(self, *op):
+        self.pending.append(list(op))
+
+    def save(self):
+        """Append pending operations to journal, compact journal if it became too big."""
+        if not os.path.exists(self.path):
+            self.compact()
+            return
+        if not self.pending:
+            return
+        with open(self.journal_path, "ab") as file:
+            file.write(b"".join(json.dumps(op).encode("utf8") + b"\n" for op in self.pending))
+            file.flush()
+            os.fsync(file.fileno())
+            size = file.tell()
+        self.pending.clear()
+        if size > max(self.compact_size, os.path.getsize(self.path)):
+            self.compact()
+
+    def compact(self):
+        """Write whole dict to base file and truncate journal.
+
+        Replaying journal again on top of new base file gives the same dict, so crash between replacing base file
+        and truncating journal loses nothing.
+        """
+        temp = self.path + ".tmp"
+        with open(temp, "wb") as file:
+            pickle.dump(self.data, file)
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(temp, self.path)
+        with open(self.journal_path, "wb") as file:
+            os.fsync(file.fileno())
+        self.pending.clear()
+
+    def __getitem__(self, artist):
+        return JournaledArtist(self, artist, self.data[artist])
+
+    def __setitem__(self, artist, value):
+        value = dict(value)
+        self.data[artist] = value
+        self.log("put", artist, dict(value))
+
+    def __delitem__(self, artist):
+        del self.data[artist]
+        self.log("drop", artist)
+
+    def __contains__(self, artist):
+        return artist in self.data
+
+    def __iter__(self):
+        return iter(self.data)
+
+    def __len__(self):
+        return len(self.data)
+
+    def clear(self):
+        self.data.clear()
+        self.log("clear")
+
+
+class JournaledArtist(MutableMapping):
+    """Associations of one artist, changes are logged to journal of parent JournaledAssociations."""
+    def __init__(self, parent, artist, data):
+        self.parent = parent
+        self.artist = artist
+        self.data = data
+
+    def __getitem__(self, key):
+        return self.data[key]
+
+    def __setitem__(self, key, value):
+        self.data[key] = value
+        self.parent.log("set", self.artist, key, value)
+
+    def __delitem__(self, key):
+        del self.data[key]
+        self.parent.log("del", self.artist, key)
+
+    def __contains__(self, key):
+        return key in self.data
+
+    def __iter__(self):
+        return iter(self.data)
+
+    def __len__(self):
+        return len(self.data)
+
+
+def replayed(data, path):
+    """Return associations dict data with journal of base file path applied.  Journal isn't changed, so it's used by
+    read-only tools.
+    """
+    try:
+        file = open(path + SUFFIX, "rb")
+    except FileNotFoundError:
+        return data
+    with file:
+        _replay(data, file)
+    return data
+
+
+def _replay(data, file):
+    """Apply operations from opened journal to data, return size of journal part which was applied."""
+    good = 0
+    for line in file:
+        if not line.endswith(b"\n"):
+            break
+        try:
+            _apply(data, json.loads(line.decode("utf8")))
+        except (ValueError, KeyError, IndexError, TypeError):
+            break
+        good += len(line)
+    return good
+
+
+def _apply(data, op):
+    """Apply one journal operation to associations dict."""
+    if op[0] == "set":
+        data.setdefault(op[1], dict())[op[2]] = op[3]
+    elif op[0] == "del":
+        data.get(op[1], dict()).pop(op[2], None)
+    elif op[0] == "put":
+        data[op[1]] = op[2]
+    elif op[0] == "drop":
+        data.pop(op[1], None)
+    elif op[0] == "clear":
+        data.clear()
+    else:
+        raise ValueError("Unknown journal operation " + str(op[0]))
@@ -0,0 +1,134 @@
+"""Module that implement normalization of artists and titles and index of canonical keys for associations dicts.
+
+Associations are looked up by exact key first, on miss canonical form of key (unicode normalized, casefolded, with
+collapsed whitespace) is looked up in index.  Optional fuzzy fallback compares key only with a bounded number of
+canonical keys of similar length and the same first letter.
+"""
+
+
+import unicodedata
+import difflib
+
+
+def canonical(text):
+    """Return canonical form of text used as index key."""
+    return " ".join(unicodedata.normalize("NFKC", str(text)).casefold().split())
+
+
+class KeyIndex:
+    """Index from canonical form of keys to keys themselves."""
+    def __init__(self, keys=(), limit=64, cutoff=0.85):
+        """
+        Construct a new 'KeyIndex' object.
+
+        :param keys: iterable of keys.
+        :param limit: maximum number of candidates compared by fuzzy lookup.
+        :param cutoff: minimum similarity ratio accepted by fuzzy lookup.
+        :return returns nothing.
+        """
+        self.keys = dict()
+        self.buckets = dict()
+        self.limit = limit
+        self.cutoff = cutoff
+        for key in keys:
+            self.add(key)
+
+    def add(self, key):
+        """Add key to index, key added first wins when two keys have the same canonical form."""
+        form = canonical(key)
+        if form in self.keys:
+            return
+        self.keys[form] = key
+        self.buckets.setdefault((form[:1], len(form)), set()).add(form)
+
+    def discard(self, key):
+        """Remove key from index if it's there."""
+        form = canonical(key)
+        if self.keys.get(form) != key:
+            return
+        del self.keys[form]
+        bucket = self.buckets[(form[:1], len(form))]
+        bucket.discard(form)
+        if not bucket:
+            del self.buckets[(form[:1], len(form))]
+
+    def lookup(self, key, fuzzy=False):
+        """Return indexed key with the same canonical form as key, or the most similar one if fuzzy is True.
+        Return None when nothing found.
+        """
+        form = canonical(key)
+        if form in self.keys:
+            return self.keys[form]
+        if not fuzzy or not form:
+            return None
+
+        candidates = list()
+        spread = max(2, len(form) // 5)
+        for delta in sorted(range(-spread, spread + 1), key=abs):
+            candidates.extend(self.buckets.get((form[:1], len(form) + delta), ()))
+            if len(candidates) >= self.limit:
+                break
+        match = difflib.get_close_matches(form, candidates[:self.limit], n=1, cutoff=self.cutoff)
+        if match:
+            return self.keys[match[0]]
+        return None
+
+
+class AssociationIndex:
+    """Canonical key index of associations dict with structure {"author": {key: value}}.
+
+    Artists are indexed on first lookup of artist which isn't written exactly as in dict, keys of artist(song titles)
+    are indexed on first lookup in that artist.  So index of big dict kept in database costs nothing until it's needed.
+    """
+    def __init__(self, assoc, fuzzy=False):
+        """
+        Construct a new 'AssociationIndex' object.
+
+        :param assoc: associations dict.
+        :param fuzzy: use fuzzy fallback when canonical key isn't found.
+        :return returns nothing.
+        """
+        self.assoc = assoc
+        self.fuzzy = fuzzy
+        self.index = None
+        self.titles = dict()
+
+    @property
+    def artists(self):
+        """KeyIndex of artists, it's built on first use."""
+        if self.index is None:
+            self.index = KeyIndex(self.assoc)
+        return self.index
+
+    def artist(self, artist, fuzzy=None):
+        """Return artist as it is written in associations dict or None.  fuzzy overrides fuzzy attribute."""
+        if artist in self.assoc:
+            return artist
+        return self.artists.lookup(artist, fuzzy=self.fuzzy if fuzzy is None else fuzzy)
+
+    def title(self, artist, title, fuzzy=None):
+        """Return title of artist(already found by artist method) as it is written in associations dict or None."""
+        titles = self.assoc.get(artist)
+        if titles is None:
+            return None
+        if title in titles:
+            return title
+        if artist not in self.titles:
+            self.titles[artist] = KeyIndex(titles)
+        return self.titles[artist].lookup(title, fuzzy=self.fuzzy if fuzzy is None else fuzzy)
+
+    def add(self, artist, title=None):
+        """Register artist and title which were added to associations dict."""
+        if self.index is not None:
+            self.index.add(artist)
+        if title is not None and artist in self.titles:
+            self.titles[artist].add(title)
+
+    def discard(self, artist, title=None):
+        """Unregister artist or title of artist which were deleted from associations dict."""
+        if title is None:
+            if self.index is not None:
+                self.index.discard(artist)
+            self.titles.pop(artist, None)
+        elif artist in self.titles:
+            self.titles[artist].discard(title)
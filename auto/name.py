@@ -3,12 +3,13 @@
 
 from MP3.too_easy_mp3 import SimpleMP3
 import os
+import re
 
 
-def auto(file, ban_list, replace_artist=True, replace_title=True):
+def auto(file, ban_list, replace_artist=True, replace_title=True, templates=None):
     """If file doesn't have any tags add them.  Generate audio tags using filename splitted by '-'.
     First element of received list interpreted as artist, others as a song name.  ban_list is a path to file that
-    contain phrases and symbols which be later replaced by ' '.
+    contain phrases and symbols which be later replaced by ' '.  ban_list can be list of phrases or BanMatcher.
 
     OPTIONS
         replace_artist: boolean
@@ -16,41 +17,70 @@ def auto(file, ban_list, replace_artist=True, replace_title=True):
 
         replace_title: boolean
             If this option is False set title tag only if artist tag isn't exist.
+
+        templates: TemplateMatcher
+            Filename templates tried before splitting by '-'.  Matched template sets artist, title and also album
+            and number tags(only if they aren't exist).
+
+    Return True if file was changed, file isn't written when tags already have generated values.
     """
     audio = SimpleMP3(file)
     name = os.path.split(file)[1]
     name = name.replace(".mp3", "")
 
-    for el in ban_list:
-        name = name.replace(el, " ").rstrip()
+    if isinstance(ban_list, BanMatcher):
+        name = ban_list.apply(name)
+    else:
+        for el in ban_list:
+            name = name.replace(el, " ").rstrip()
+
+    fields = templates.match(file, name) if templates else None
+    if fields:
+        artist = fields.get("artist", "").title().strip()
+        title = fields.get("title", "").title().strip()
+    else:
+        tags = name.split("-")
+        title = str()
+        artist = tags[0].title()
+        artist = artist.strip()
+
+        for i in range(1, len(tags)):
+            title = title + " " + str(tags[i])
+        title = title.title().strip()
 
-    tags = name.split("-")
-    title = str()
-    artist = tags[0].title()
-    artist = artist.strip()
+    res = dict()
 
     if replace_artist:
-        audio["artist"] = artist
+        res["artist"] = artist
     else:
         try:
             if not audio["artist"]:
-                audio["artist"] = artist
+                res["artist"] = artist
         except AttributeError:
             pass
 
-    for i in range(1, len(tags)):
-        title = title + " " + str(tags[i])
-    title = title.title().strip()
-
     if replace_title:
-        audio["title"] = title
+        res["title"] = title
     else:
         try:
             if not audio["title"]:
-                audio["title"] = artist
+                res["title"] = artist
         except AttributeError:
             pass
 
+    if fields:
+        for k in ("artist", "title"):
+            if not fields.get(k):
+                res.pop(k, None)
+        if fields.get("album") and not audio["album"]:
+            res["album"] = fields["album"].strip()
+        if fields.get("track") and not audio["number"]:
+            res["number"] = str(int(fields["track"]))
+
+    res = {k: v for k, v in res.items() if str(audio[k] or "") != v}
+    audio.update(res)
+    return bool(res)
+
 
 def form_ban_list(path):
     """Form list of baned words using file from path."""
@@ -61,6 +91,216 @@ def form_ban_list(path):
     return ban_list
 
 
+class BanMatcher:
+    """Ban list compiled into Aho-Corasick automaton.
+
+    apply gives the same result as replacing every item of ban list by ' ' one by one (with rstrip after each
+    replacement), but filename is scanned once per replacement which really happened instead of once per item.
+    """
+    def __init__(self, ban_list):
+        """
+        Construct a new 'BanMatcher' object.
+
+        :param ban_list: list of banned words/symbols.
+        :return returns nothing.
+        """
+        self.items = list(ban_list)
+        self.always = frozenset(i for i, el in enumerate(self.items) if not el)
+        self.goto = [dict()]
+        self.fail = [0]
+        self.out = [frozenset()]
+
+        outputs = [set()]
+        for i, el in enumerate(self.items):
+            if not el:
+                continue
+            node = 0
+            for ch in el:
+                if ch not in self.goto[node]:
+                    self.goto.append(dict())
+                    self.fail.append(0)
+                    outputs.append(set())
+                    self.goto[node][ch] = len(self.goto) - 1
+                node = self.goto[node][ch]
+            outputs[node].add(i)
+
+        queue = list(self.goto[0].values())
+        for node in queue:
+            for ch, child in self.goto[node].items():
+                state = self.fail[node]
+                while state and ch not in self.goto[state]:
+                    state = self.fail[state]
+                self.fail[child] = self.goto[state].get(ch, 0) if node else 0
+                outputs[child] |= outputs[self.fail[child]]
+                queue.append(child)
+        self.out = [frozenset(el) for el in outputs]
+
+    def find(self, text):
+        """Return set of indexes of ban list items which occur in text."""
+        found = set(self.always)
+        goto = self.goto
+        fail = self.fail
+        out = self.out
+        node = 0
+        for ch in text:
+            while node and ch not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(ch, 0)
+            if out[node]:
+                found |= out[node]
+        return found
+
+    def apply(self, name):
+        """Replace banned items in name by ' ' and return result."""
+        i = 0
+        while i < len(self.items):
+            found = [k for k in self.find(name) if k >= i]
+            if not found:
+                return name.rstrip()
+            j = min(found)
+            if j > i and name != name.rstrip():
+                # items before j don't occur, their steps only strip the name
+                name = name.rstrip()
+                i += 1
+                continue
+            name = name.replace(self.items[j], " ").rstrip()
+            i = j + 1
+        return name
+
+
+_matchers = dict()
+
+
+def compile_ban_list(ban_list):
+    """Return BanMatcher for given list."""
+    return BanMatcher(ban_list)
+
+
+def load_ban_matcher(path):
+    """Return BanMatcher for ban list file from path.
+
+    Compiled matcher is cached and rebuilt only when file modification time or size changes.
+    """
+    stat = os.stat(path)
+    version = (stat.st_mtime_ns, stat.st_size)
+    cached = _matchers.get(path)
+    if cached and cached[0] == version:
+        return cached[1]
+    matcher = BanMatcher(form_ban_list(path))
+    _matchers[path] = (version, matcher)
+    return matcher
+
+
+template_fields = {"artist": r"[^/]+?", "title": r"[^/]+?", "album": r"[^/]+?", "track": r"\d{1,3}",
+                   "year": r"\d{4}", "*": r"[^/]*?"}
+
+
+def compile_template(template):
+    """Return compiled regular expression for filename template.
+
+    Template is a path tail with fields in braces, e.g. '{track}. {artist} - {title}' or
+    '{artist}/{album}/{track} {title}'.  Supported fields are artist, title, album, track, year and * (skipped text).
+    Whitespace in template matches one or more whitespace characters, '/' separates directories.  When {track} is
+    followed only by whitespace, text after it can't start with punctuation, so '311 - Amber' isn't read as track
+    311 with title '- Amber'.
+    """
+    pattern = str()
+    pos = 0
+    previous = None
+    for field in re.finditer(r"{([^{}]*)}", template):
+        pattern += _template_literal(template[pos:field.start()], after_track=previous == "track")
+        name = field.group(1)
+        if name not in template_fields:
+            raise TemplateError("Unknown template field " + name)
+        if name == "*":
+            pattern += template_fields[name]
+        else:
+            pattern += "(?P<{}>{})".format(name, template_fields[name])
+        pos = field.end()
+        previous = name
+    pattern += _template_literal(template[pos:], after_track=previous == "track")
+    try:
+        return re.compile(pattern)
+    except re.error as e:
+        raise TemplateError("Bad template {}: {}".format(template, e))
+
+
+def _template_literal(text, after_track=False):
+    """Return regular expression for literal part of template, after_track tells that it follows {track}."""
+    res = str()
+    for part in re.split(r"(\s+)", text):
+        if part.isspace():
+            res += r"\s+"
+        elif part:
+            res += re.escape(part)
+    if after_track and text.isspace():
+        res += r"(?![-.,;:_~])"
+    return res
+
+
+class TemplateMatcher:
+    """Set of compiled filename templates which are tried in priority order.
+
+    Index of template matched last time is remembered for every directory, files of one directory usually have
+    the same pattern so it's tried first.
+    """
+    def __init__(self, templates):
+        """
+        Construct a new 'TemplateMatcher' object.
+
+        :param templates: list of templates, first has the highest priority.
+        :return returns nothing.
+        """
+        self.templates = list()
+        for el in templates:
+            self.templates.append((el, el.count("/") + 1, compile_template(el)))
+        self.dirs = dict()
+
+    def match(self, path, name=None):
+        """
+        Return dict of fields from first template which matches path or None.
+
+        :param path: path to file.
+        :param name: filename without extension(e.g. already cleared by ban list), used instead of last component.
+        :return returns dict with field names as keys.
+        """
+        dir_, filename = os.path.split(os.path.normpath(path))
+        if name is None:
+            name = os.path.splitext(filename)[0]
+        parts = dir_.replace("\\", "/").split("/") + [name]
+
+        first = self.dirs.get(dir_)
+        order = range(len(self.templates))
+        if first is not None:
+            order = [first] + [i for i in order if i != first]
+
+        for i in order:
+            template, depth, regex = self.templates[i]
+            if depth > len(parts) or not all(_is_folder(el) for el in parts[-depth:-1]):
+                continue
+            match = regex.fullmatch("/".join(parts[-depth:]))
+            if match:
+                self.dirs[dir_] = i
+                return {k: v for k, v in match.groupdict().items() if v}
+        return None
+
+
+def _is_folder(part):
+    """Check that path component is a real folder name(not empty, '.', '..' or a drive)."""
+    return bool(part) and part not in (".", "..") and not part.endswith(":")
+
+
+def form_templates(path):
+    """Form list of filename templates using file from path, empty lines and lines starting with '#' are skipped."""
+    templates = list()
+    with open(path, "r", encoding="utf8") as file:
+        for line in file:
+            line = line.replace("\n", "")
+            if line.strip() and not line.startswith("#"):
+                templates.append(line)
+    return templates
+
+
 def ban_item(ban_list, item):
     """Add item to given list."""
     ban_list.append(item)
@@ -77,3 +317,9 @@ def save_list(ban_list, path):
         for el in ban_list:
             el += "\n"
             file.write(el)
+
+
+class TemplateError(Exception):
+    """Error that is raised on bad filename template."""
+    def __init__(self, value):
+        self.value = value
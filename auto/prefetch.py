@@ -0,0 +1,89 @@
+"""Module that implement background prefetching of files.
+
+Prefetcher loads files in background threads by given function and keeps results by path together with size and
+modification time of file.  Every request replaces paths which weren't loaded yet, so only the latest neighbours of
+selected file are loaded.  Result is given only if file wasn't changed since it was loaded.
+"""
+
+
+from collections import OrderedDict, deque
+import threading
+import os
+
+
+CACHE_SIZE = 32
+
+
+class Prefetcher:
+    """Load files by function in background threads and keep results until they are taken."""
+    def __init__(self, load, workers=1, cache_size=CACHE_SIZE):
+        """
+        Construct a new 'Prefetcher' object.
+
+        :param load: function which takes path and returns loaded object, it's called from background threads.
+        :param workers: number of background threads.
+        :param cache_size: number of loaded objects kept.
+        :return returns nothing.
+        """
+        self.load = load
+        self.cache_size = cache_size
+        self.cache = OrderedDict()
+        self.pending = deque()
+        self.loading = set()
+        self.condition = threading.Condition()
+        self.closed = False
+        self.threads = [threading.Thread(target=self._work, daemon=True) for i in range(workers)]
+        for thread in self.threads:
+            thread.start()
+
+    def request(self, paths):
+        """Load paths(most wanted first) in background, paths requested before and not started are dropped."""
+        with self.condition:
+            self.pending.clear()
+            for path in paths:
+                if path not in self.cache and path not in self.loading and path not in self.pending:
+                    self.pending.append(path)
+            self.condition.notify_all()
+
+    def take(self, path):
+        """Return object loaded from path and forget it, None if it wasn't loaded or file was changed since."""
+        with self.condition:
+            cached = self.cache.pop(path, None)
+        if cached is None:
+            return None
+        try:
+            st = os.stat(path)
+        except OSError:
+            return None
+        if cached[0] != (st.st_size, st.st_mtime_ns):
+            return None
+        return cached[1]
+
+    def _work(self):
+        while True:
+            with self.condition:
+                while not self.pending and not self.closed:
+                    self.condition.wait()
+                if self.closed:
+                    return
+                path = self.pending.popleft()
+                self.loading.add(path)
+            try:
+                st = os.stat(path)
+                value = self.load(path)
+            except Exception:
+                value = None
+            with self.condition:
+                self.loading.discard(path)
+                if value is not None:
+                    self.cache[path] = ((st.st_size, st.st_mtime_ns), value)
+                    self.cache.move_to_end(path)
+                    while len(self.cache) > self.cache_size:
+                        self.cache.popitem(last=False)
+
+    def close(self):
+        """Stop background threads."""
+        with self.condition:
+            self.closed = True
+            self.pending.clear()
+            self.condition.notify_all()
@@ -0,0 +1,165 @@
+"""Module that implement in-memory inverted index of tokens used to filter files by their tags, and sorting and
+grouping of in-memory tag records.
+
+Texts are split into canonical tokens(see auto.keys.canonical), every token maps to set of keys of files which
+contain it.  Tokens are kept sorted too, so each word of query is matched as prefix of tokens by binary search.
+
+Record is a dict with 'name', 'title', 'artist', 'album', 'number', 'size' and 'mtime' of file, it's made once when
+file is loaded, so files can be sorted and grouped again without reading them.
+"""
+
+
+from auto.keys import canonical
+from itertools import groupby
+import bisect
+import time
+import re
+
+
+CACHE_SIZE = 256
+
+SORT_FIELDS = ("name", "artist", "album", "number", "title", "size", "mtime")
+
+_word = re.compile(r"\w+")
+_number = re.compile(r"\d+")
+
+
+def tokens(text):
+    """Return list of canonical tokens of text."""
+    if text is None:
+        return []
+    return _word.findall(canonical(text))
+
+
+class TokenIndex:
+    """Inverted index from tokens to keys, keys can be added and removed one by one."""
+    def __init__(self):
+        self.postings = dict()
+        self.sorted_tokens = list()
+        self.keys = dict()
+        self.cache = dict()
+
+    def add(self, key, texts):
+        """Index key by tokens of texts, key which is already indexed is indexed again."""
+        if key in self.keys:
+            self.remove(key)
+        words = set()
+        for text in texts:
+            words.update(tokens(text))
+        self.keys[key] = words
+        for word in words:
+            if word not in self.postings:
+                self.postings[word] = set()
+                bisect.insort(self.sorted_tokens, word)
+            self.postings[word].add(key)
+        self.cache.clear()
+
+    def remove(self, key):
+        """Remove key from index if it's there."""
+        for word in self.keys.pop(key, ()):
+            keys = self.postings[word]
+            keys.discard(key)
+            if not keys:
+                del self.postings[word]
+                del self.sorted_tokens[bisect.bisect_left(self.sorted_tokens, word)]
+        self.cache.clear()
+
+    def prefix(self, word):
+        """Return set of keys which have token starting with word."""
+        if word in self.cache:
+            return self.cache[word]
+        res = set()
+        i = bisect.bisect_left(self.sorted_tokens, word)
+        while i < len(self.sorted_tokens) and self.sorted_tokens[i].startswith(word):
+            res |= self.postings[self.sorted_tokens[i]]
+            i += 1
+        if len(self.cache) >= CACHE_SIZE:
+            self.cache.clear()
+        self.cache[word] = res
+        return res
+
+    def search(self, query):
+        """Return set of keys which match every word of query as a token prefix, None if query has no words."""
+        words = tokens(query)
+        if not words:
+            return None
+        sets = sorted((self.prefix(word) for word in words), key=len)
+        res = set(sets[0])
+        for el in sets[1:]:
+            res &= el
+            if not res:
+                break
+        return res
+
+    def __len__(self):
+        return len(self.keys)
+
+
+def make_record(name, audio, size=None, mtime=None):
+    """Return record of file from its name and object with SimpleMP3 like access to tags, sort keys are computed
+    at once.
+    """
+    record = dict(name=name, size=size, mtime=mtime, keys=dict(), groups=dict())
+    for tag in ("title", "artist", "album", "number"):
+        value = audio[tag]
+        record[tag] = str(value) if value is not None else None
+    for field in SORT_FIELDS:
+        sort_key(record, field)
+    return record
+
+
+def sort_key(record, field):
+    """Return key which orders records by field, records without value go last.  Key is cached in record."""
+    if field not in record["keys"]:
+        record["keys"][field] = _sort_key(record, field)
+    return record["keys"][field]
+
+
+def _sort_key(record, field):
+    value = record.get(field)
+    if field == "number":
+        match = _number.match(value or "")
+        value = int(match.group()) if match else None
+    elif isinstance(value, str):
+        value = canonical(value) or None
+    if value is None:
+        return 1, 0, canonical(record["name"])
+    return 0, value, canonical(record["name"])
+
+
+def sort_names(records, names, field):
+    """Return names sorted by field of their records."""
+    return sorted(names, key=lambda name: sort_key(records[name], field))
+
+
+def group_label(record, field):
+    """Return (canonical form of label, label) of group which record belongs to when records are grouped by field.
+    Labels which differ only in case or whitespace have the same canonical form.  Result is cached in record.
+    """
+    if field not in record["groups"]:
+        label = _group_label(record, field)
+        record["groups"][field] = canonical(label), label
+    return record["groups"][field]
+
+
+def _group_label(record, field):
+    value = record.get(field)
+    if field == "number":
+        match = _number.match(value or "")
+        return "Track " + match.group().lstrip("0") if match else "No track number"
+    if field == "size":
+        return "{} MB".format(value // 2 ** 20) if value is not None else "Unknown size"
+    if field == "mtime":
+        return time.strftime("%Y-%m-%d", time.localtime(value / 10 ** 9)) if value is not None else "Unknown date"
+    if field == "name":
+        return canonical(value)[:1].upper() or "#"
+    return value.strip() if value and value.strip() else "Unknown " + field
+
+
+def group_names(records, names, field):
+    """Return list of (label, names) of consecutive names(already sorted by field) with the same group label."""
+    res = list()
+    for key, group in groupby(names, key=lambda name: group_label(records[name], field)[0]):
+        group = list(group)
+        res.append((group_label(records[group[0]], field)[1], group))
+    return res
@@ -0,0 +1,201 @@
+"""Module that implement immutable memory-mapped snapshot of associations dict.
+
+Snapshot is a sorted table of records with an offset index in front of it:
+    magic(8 bytes) | records count(u32) | artists count(u32) | offsets(u64 per record) | records
+record:
+    sort key | artist | key | value, every string is utf8 prefixed by its length(u32)
+Sort key is canonical(artist) + '\\0' + canonical(key) (see auto.keys), so lookups are binary searches which ignore
+case and whitespace differences.  File is opened with mmap and never deserialized, processes which open the same
+snapshot share it through page cache.
+
+Compile snapshot from associations file or database:
+    python -m auto.snapshot img|album source destination
+"""
+
+
+from collections.abc import Mapping
+from auto.keys import canonical
+import struct
+import mmap
+import os
+import sys
+
+
+MAGIC = b"ATSNAP1\0"
+HEADER = struct.Struct("<8sII")
+OFFSET = struct.Struct("<Q")
+LENGTH = struct.Struct("<I")
+
+
+def is_snapshot(path):
+    """Return True if file from path is an associations snapshot."""
+    with open(path, "rb") as file:
+        return file.read(len(MAGIC)) == MAGIC
+
+
+def compile_snapshot(assoc, path):
+    """Write snapshot of associations dict({"author": {key: value}}) to path.
+
+    File is written next to destination and renamed, so processes never see half written snapshot.  When several
+    artists or keys have the same canonical form the first one is kept.
+    """
+    records = dict()
+    artists = set()
+    for artist in assoc:
+        for key, value in assoc[artist].items():
+            sort_key = (canonical(artist) + "\0" + canonical(key)).encode("utf8")
+            if sort_key not in records:
+                records[sort_key] = (artist, key, value)
+                artists.add(canonical(artist))
+
+    temp = path + ".tmp"
+    with open(temp, "wb") as file:
+        file.write(HEADER.pack(MAGIC, len(records), len(artists)))
+        offset = HEADER.size + OFFSET.size * len(records)
+        blobs = list()
+        for sort_key in sorted(records):
+            blob = _pack(sort_key) + b"".join(_pack(str(el).encode("utf8")) for el in records[sort_key])
+            file.write(OFFSET.pack(offset))
+            offset += len(blob)
+            blobs.append(blob)
+        for blob in blobs:
+            file.write(blob)
+    os.replace(temp, path)
+
+
+def _pack(data):
+    return LENGTH.pack(len(data)) + data
+
+
+class Snapshot(Mapping):
+    """Read-only associations dict backed by memory-mapped snapshot file.
+
+    Artist and keys are found by canonical form, so there is no need in separate canonical key index.
+    """
+    canonical = True
+
+    def __init__(self, path):
+        """
+        Construct a new 'Snapshot' object.
+
+        :param path: path to snapshot file.
+        :return returns nothing.
+        """
+        self.path = path
+        with open(path, "rb") as file:
+            self.data = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, self.count, self.artists = HEADER.unpack_from(self.data, 0)
+        if magic != MAGIC:
+            raise SnapshotError("Not a snapshot file " + path)
+
+    def _offset(self, i):
+        return OFFSET.unpack_from(self.data, HEADER.size + OFFSET.size * i)[0]
+
+    def _string(self, pos):
+        """Return (bytes, position after them) of length prefixed string at pos."""
+        length = LENGTH.unpack_from(self.data, pos)[0]
+        pos += LENGTH.size
+        return self.data[pos:pos + length], pos + length
+
+    def sort_key(self, i):
+        return self._string(self._offset(i))[0]
+
+    def record(self, i):
+        """Return (artist, key, value) of record number i."""
+        pos = self._string(self._offset(i))[1]
+        res = list()
+        for _ in range(3):
+            data, pos = self._string(pos)
+            res.append(data.decode("utf8"))
+        return tuple(res)
+
+    def bisect(self, sort_key, lo=0, hi=None):
+        """Return index of first record which sort key isn't less than sort_key."""
+        if hi is None:
+            hi = self.count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self.sort_key(mid) < sort_key:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def _range(self, artist):
+        """Return (first, last + 1) indexes of artist records."""
+        prefix = (canonical(artist) + "\0").encode("utf8")
+        lo = self.bisect(prefix)
+        hi = self.bisect(prefix[:-1] + b"\1", lo=lo)
+        return lo, hi
+
+    def __contains__(self, artist):
+        lo, hi = self._range(artist)
+        return lo < hi
+
+    def __getitem__(self, artist):
+        lo, hi = self._range(artist)
+        if lo == hi:
+            raise KeyError(artist)
+        return SnapshotArtist(self, artist, lo, hi)
+
+    def __iter__(self):
+        last = None
+        for i in range(self.count):
+            artist = self.sort_key(i).split(b"\0", 1)[0]
+            if artist != last:
+                last = artist
+                yield self.record(i)[0]
+
+    def __len__(self):
+        return self.artists
+
+    def close(self):
+        self.data.close()
+
+
+class SnapshotArtist(Mapping):
+    """Read-only associations of one artist from snapshot."""
+    def __init__(self, snapshot, artist, lo, hi):
+        self.snapshot = snapshot
+        self.prefix = (canonical(artist) + "\0").encode("utf8")
+        self.lo = lo
+        self.hi = hi
+
+    def __getitem__(self, key):
+        sort_key = self.prefix + canonical(key).encode("utf8")
+        i = self.snapshot.bisect(sort_key, lo=self.lo, hi=self.hi)
+        if i < self.hi and self.snapshot.sort_key(i) == sort_key:
+            return self.snapshot.record(i)[2]
+        raise KeyError(key)
+
+    def __iter__(self):
+        for i in range(self.lo, self.hi):
+            yield self.snapshot.record(i)[1]
+
+    def __len__(self):
+        return self.hi - self.lo
+
+
+class SnapshotError(Exception):
+    """Error that is raised on broken snapshot file."""
+    def __init__(self, value):
+        self.value = value
+
+
+if __name__ == "__main__":
+    import auto.img
+    import auto.album
+    import auto.storage
+
+    if len(sys.argv) != 4 or sys.argv[1] not in ("img", "album"):
+        print("Usage: python -m auto.snapshot img|album source destination", file=sys.stderr)
+        sys.exit(2)
+    assoc_type, source, destination = sys.argv[1:]
+    if source.endswith(".db"):
+        associations = auto.storage.SQLiteStore(source).associations(assoc_type)
+    elif assoc_type == "img":
+        associations = auto.img.load_associations(source)
+    else:
+        associations = auto.album.load_associations(source)
+    compile_snapshot(associations, destination)
+    print("[Info]Snapshot written to " + destination)
@@ -0,0 +1,208 @@
+"""Module that implement SQLite storage of associations dicts and ban list.
+
+SQLiteStore.associations returns mapping objects which behave like associations dicts({"author": {key: value}}),
+so functions from auto.img and auto.album work with them unchanged, but every lookup is an indexed query and every
+add or delete touches only one row.  Changes become permanent after commit.
+"""
+
+
+from collections.abc import MutableMapping
+import pathlib
+import sqlite3
+import threading
+import os
+import auto.name
+
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS artists (kind TEXT NOT NULL, artist TEXT NOT NULL, UNIQUE (kind, artist));
+CREATE TABLE IF NOT EXISTS associations (kind TEXT NOT NULL, artist TEXT NOT NULL, key TEXT NOT NULL,
+                                         value TEXT NOT NULL, UNIQUE (kind, artist, key));
+CREATE TABLE IF NOT EXISTS ban_list (pos INTEGER PRIMARY KEY, item TEXT NOT NULL);
+CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value TEXT);
+"""
+
+UPSERT = """INSERT INTO associations (kind, artist, key, value) VALUES (?, ?, ?, ?)
+            ON CONFLICT (kind, artist, key) DO UPDATE SET value = excluded.value"""
+
+
+class SQLiteStore:
+    """Database with associations of every type and ban list."""
+    def __init__(self, path, read_only=False):
+        """
+        Construct a new 'SQLiteStore' object, create database file if it doesn't exist.
+
+        :param path: path to database file.
+        :param read_only: open existing database without write access, nothing is created or changed.
+        :return returns nothing.
+        """
+        self.path = path
+        self.lock = threading.RLock()
+        if read_only:
+            uri = pathlib.Path(path).resolve().as_uri() + "?mode=ro"
+            self.conn = sqlite3.connect(uri, uri=True, check_same_thread=False)
+            return
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.executescript(SCHEMA)
+        self.conn.commit()
+
+    def associations(self, kind):
+        """Return mapping with associations of kind('img' or 'album')."""
+        return SQLiteAssociations(self, kind)
+
+    def is_empty(self, kind):
+        """Return True if there are no associations of kind."""
+        return self.query_one("SELECT 1 FROM artists WHERE kind = ? LIMIT 1", (kind,)) is None
+
+    def import_associations(self, kind, assoc):
+        """Add all associations from dict assoc({"author": {key: value}}), existing keys are replaced."""
+        with self.lock:
+            self.conn.executemany("INSERT OR IGNORE INTO artists (kind, artist) VALUES (?, ?)",
+                                  ((kind, artist) for artist in assoc))
+            self.conn.executemany(UPSERT, ((kind, artist, key, assoc[artist][key])
+                                           for artist in assoc for key in assoc[artist]))
+
+    def load_ban_list(self):
+        """Return ban list."""
+        return [row[0] for row in self.query_all("SELECT item FROM ban_list ORDER BY pos")]
+
+    def save_ban_list(self, ban_list, source=None):
+        """Replace ban list, source is an optional identity(e.g. file modification time) of imported file.
+
+        Nothing is committed here, so pending association changes aren't made permanent behind user's back.  If change
+        is rolled back ban list file is simply imported again.
+        """
+        with self.lock:
+            self.conn.execute("DELETE FROM ban_list")
+            self.conn.executemany("INSERT INTO ban_list (pos, item) VALUES (?, ?)", enumerate(ban_list))
+            self.set_meta("ban_list_source", source)
+
+    def ban_list_source(self):
+        """Return source identity given to last save_ban_list."""
+        return self.meta("ban_list_source")
+
+    def meta(self, name):
+        """Return value stored in meta table under name, None if there is no such value."""
+        row = self.query_one("SELECT value FROM meta WHERE name = ?", (name,))
+        return row[0] if row else None
+
+    def set_meta(self, name, value):
+        """Store value in meta table under name, it becomes permanent after commit."""
+        self.execute("INSERT OR REPLACE INTO meta (name, value) VALUES (?, ?)", (name, value))
+
+    def import_ban_list(self, path):
+        """Import ban list file from path if it was changed since last import.
+
+        :return returns True if ban list was imported.
+        """
+        stat = os.stat(path)
+        source = "{}:{}".format(stat.st_mtime_ns, stat.st_size)
+        if source == self.ban_list_source():
+            return False
+        self.save_ban_list(auto.name.form_ban_list(path), source=source)
+        return True
+
+    def query_one(self, sql, args=()):
+        with self.lock:
+            return self.conn.execute(sql, args).fetchone()
+
+    def query_all(self, sql, args=()):
+        with self.lock:
+            return self.conn.execute(sql, args).fetchall()
+
+    def execute(self, sql, args=()):
+        with self.lock:
+            return self.conn.execute(sql, args)
+
+    def commit(self):
+        """Make all changes permanent."""
+        with self.lock:
+            self.conn.commit()
+
+    def rollback(self):
+        """Discard changes made after last commit."""
+        with self.lock:
+            self.conn.rollback()
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
+
+
+class SQLiteAssociations(MutableMapping):
+    """Associations of one kind, mapping from artist to ArtistAssociations."""
+    def __init__(self, store, kind):
+        self.store = store
+        self.kind = kind
+
+    def __contains__(self, artist):
+        return self.store.query_one("SELECT 1 FROM artists WHERE kind = ? AND artist = ?",
+                                    (self.kind, artist)) is not None
+
+    def __getitem__(self, artist):
+        if artist not in self:
+            raise KeyError(artist)
+        return ArtistAssociations(self.store, self.kind, artist)
+
+    def __setitem__(self, artist, value):
+        with self.store.lock:
+            self.store.execute("INSERT OR IGNORE INTO artists (kind, artist) VALUES (?, ?)", (self.kind, artist))
+            self.store.execute("DELETE FROM associations WHERE kind = ? AND artist = ?", (self.kind, artist))
+            for key in value:
+                self.store.execute("INSERT INTO associations (kind, artist, key, value) VALUES (?, ?, ?, ?)",
+                                   (self.kind, artist, key, value[key]))
+
+    def __delitem__(self, artist):
+        if artist not in self:
+            raise KeyError(artist)
+        with self.store.lock:
+            self.store.execute("DELETE FROM associations WHERE kind = ? AND artist = ?", (self.kind, artist))
+            self.store.execute("DELETE FROM artists WHERE kind = ? AND artist = ?", (self.kind, artist))
+
+    def __iter__(self):
+        for row in self.store.query_all("SELECT artist FROM artists WHERE kind = ? ORDER BY rowid", (self.kind,)):
+            yield row[0]
+
+    def __len__(self):
+        return self.store.query_one("SELECT COUNT(*) FROM artists WHERE kind = ?", (self.kind,))[0]
+
+    def clear(self):
+        with self.store.lock:
+            self.store.execute("DELETE FROM associations WHERE kind = ?", (self.kind,))
+            self.store.execute("DELETE FROM artists WHERE kind = ?", (self.kind,))
+
+
+class ArtistAssociations(MutableMapping):
+    """Associations of one artist, mapping from association name(or song title) to its value."""
+    def __init__(self, store, kind, artist):
+        self.store = store
+        self.kind = kind
+        self.artist = artist
+
+    def __getitem__(self, key):
+        row = self.store.query_one("SELECT value FROM associations WHERE kind = ? AND artist = ? AND key = ?",
+                                   (self.kind, self.artist, key))
+        if row is None:
+            raise KeyError(key)
+        return row[0]
+
+    def __setitem__(self, key, value):
+        with self.store.lock:
+            self.store.execute("INSERT OR IGNORE INTO artists (kind, artist) VALUES (?, ?)", (self.kind, self.artist))
+            self.store.execute(UPSERT, (self.kind, self.artist, key, value))
+
+    def __delitem__(self, key):
+        cursor = self.store.execute("DELETE FROM associations WHERE kind = ? AND artist = ? AND key = ?",
+                                    (self.kind, self.artist, key))
+        if cursor.rowcount == 0:
+            raise KeyError(key)
+
+    def __iter__(self):
+        rows = self.store.query_all("SELECT key FROM associations WHERE kind = ? AND artist = ? ORDER BY rowid",
+                                    (self.kind, self.artist))
+        for row in rows:
+            yield row[0]
+
+    def __len__(self):
+        return self.store.query_one("SELECT COUNT(*) FROM associations WHERE kind = ? AND artist = ?",
+                                    (self.kind, self.artist))[0]
@@ -0,0 +1,103 @@
+"""Module that implement two-level cache of cover thumbnails.
+
+Thumbnails are keyed by sha256 of image data(e.g. APIC frame data), so tracks which share one cover share one
+thumbnail.  First level is in-memory LRU of PIL images ready to be shown, second level is a directory of small JPEG
+files named '<sha256>.jpg', it keeps thumbnails between runs.  Full size image is decoded only when thumbnail is in
+neither of them.  Cache can be used from several threads.
+"""
+
+
+from PIL import Image
+from collections import OrderedDict
+import hashlib
+import threading
+import io
+import os
+import os.path
+
+
+SIZE = (280, 280)
+MEMORY_SIZE = 128
+QUALITY = 90
+
+
+class ThumbnailCache:
+    """Cache of thumbnails of images by sha256 of their data."""
+    def __init__(self, path=None, size=SIZE, memory_size=MEMORY_SIZE):
+        """
+        Construct a new 'ThumbnailCache' object.
+
+        :param path: path to directory for JPEG thumbnails, only memory is used if it's None.
+        :param size: (width, height) which thumbnails fit in.
+        :param memory_size: number of thumbnails kept in memory.
+        :return returns nothing.
+        """
+        self.path = path
+        self.size = size
+        self.memory_size = memory_size
+        self.memory = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, data):
+        """Return thumbnail(RGB PIL image) of image from bytes, raise OSError if data isn't an image."""
+        return self._get(hashlib.sha256(data).hexdigest(), lambda: Image.open(io.BytesIO(data)))
+
+    def get_file(self, path):
+        """Return thumbnail of image file, file is read once per cache(used for images which don't change)."""
+        return self._get("file:" + os.path.abspath(path), lambda: Image.open(path), store=False)
+
+    def _get(self, key, opener, store=True):
+        with self.lock:
+            if key in self.memory:
+                self.memory.move_to_end(key)
+                return self.memory[key]
+        image = self._load(key) if store else None
+        if image is None:
+            with opener() as source:
+                image = source.convert("RGB")
+            image.thumbnail(self.size, Image.LANCZOS)
+            if store:
+                self._store(key, image)
+        with self.lock:
+            self.memory[key] = image
+            self.memory.move_to_end(key)
+            while len(self.memory) > self.memory_size:
+                self.memory.popitem(last=False)
+        return image
+
+    def _file(self, key):
+        return os.path.join(self.path, key + ".jpg")
+
+    def _load(self, key):
+        """Return thumbnail from directory or None."""
+        if not self.path:
+            return None
+        try:
+            with Image.open(self._file(key)) as image:
+                image.load()
+                return image.convert("RGB")
+        except (OSError, ValueError):
+            return None
+
+    def _store(self, key, image):
+        """Write thumbnail to directory, failures are ignored because it's only a cache."""
+        if not self.path:
+            return
+        temp = "{}.{}.tmp".format(self._file(key), threading.get_ident())
+        try:
+            os.makedirs(self.path, exist_ok=True)
+            image.save(temp, "JPEG", quality=QUALITY)
+            os.replace(temp, self._file(key))
+        except OSError:
+            try:
+                os.remove(temp)
+            except OSError:
+                pass
+
+    def clear(self):
+        """Drop thumbnails kept in memory."""
+        with self.lock:
+            self.memory.clear()
+
+    def __len__(self):
+        return len(self.memory)
@@ -0,0 +1,134 @@
+"""Module that implement running of auto tagging in child process.
+
+TaggingProcess starts child process with state of AutoTagger(see AutoTagger.tagging_state), so tagging doesn't
+compete with GUI for GIL.  Child sends events to queue which is read by parent without blocking:
+    ("write", text)        text printed by auto tagger
+    ("done", changed)      list of paths to changed files, sent when tagging is finished or stopped
+    ("failed", message)    tagging was interrupted by error
+Tagging can be stopped, paused and resumed between files.
+"""
+
+
+import multiprocessing
+import queue
+import traceback
+
+
+POLL_LIMIT = 200
+
+
+class QueueWriter:
+    """File-like object which sends written text to events queue."""
+    def __init__(self, events):
+        self.events = events
+
+    def write(self, text):
+        if text != "\n":
+            self.events.put(("write", text))
+
+    def flush(self):
+        pass
+
+
+class Control:
+    """Object with stop attribute given to AutoTagger.auto_tag as parent, checking it waits while tagging is
+    paused.
+    """
+    def __init__(self, stop_event, pause_event):
+        self.stop_event = stop_event
+        self.pause_event = pause_event
+
+    @property
+    def stop(self):
+        while self.pause_event.is_set() and not self.stop_event.is_set():
+            self.stop_event.wait(0.1)
+        return self.stop_event.is_set()
+
+
+def run(state, path, replaces, query, since, events, stop_event, pause_event):
+    """Tag files in child process, see TaggingProcess."""
+    from auto.auto_tagger import AutoTagger
+    changed = list()
+    try:
+        tagger = AutoTagger.from_state(state, file=QueueWriter(events))
+        if query:
+            path = tagger.work_list(query, roots=path, since=since)
+        changed = tagger.auto_tag(path, replaces=replaces, parent=Control(stop_event, pause_event))
+    except Exception as e:
+        events.put(("failed", "{}: {}".format(type(e).__name__, e)))
+        traceback.print_exc()
+    events.put(("done", changed))
+
+
+class TaggingProcess:
+    """Auto tagging running in child process."""
+    def __init__(self, state, path, replaces=None, query=None, since=None):
+        """
+        Construct a new 'TaggingProcess' object, process is started by start.
+
+        :param state: dict returned by AutoTagger.tagging_state.
+        :param path: path to file or directory which should be tagged, or list of paths to files.
+        :param replaces: dict of booleans, see AutoTagger.auto_tag.
+        :param query: name of auto.catalog.QUERIES query, files from its result in path are tagged instead.
+        :param since: timestamp for 'changed-since' query.
+        :return returns nothing.
+        """
+        context = multiprocessing.get_context("spawn")
+        self.events = context.Queue()
+        self.stop_event = context.Event()
+        self.pause_event = context.Event()
+        self.process = context.Process(target=run, args=(state, path, replaces, query, since, self.events,
+                                                         self.stop_event, self.pause_event))
+        self.finished = False
+
+    def start(self):
+        self.process.start()
+
+    def stop(self):
+        """Stop tagging after current file."""
+        self.stop_event.set()
+        self.pause_event.clear()
+
+    def pause(self):
+        """Pause tagging after current file."""
+        self.pause_event.set()
+
+    def resume(self):
+        self.pause_event.clear()
+
+    def join(self):
+        """Wait until child process exits, file which is being tagged is always finished.  Events are dropped
+        meanwhile, so child isn't blocked on full queue.
+        """
+        while self.process.is_alive():
+            self.poll()
+            self.process.join(0.1)
+
+    def is_paused(self):
+        return self.pause_event.is_set()
+
+    def poll(self, limit=POLL_LIMIT):
+        """Return list of at most limit events which are already in queue, doesn't wait."""
+        res = list()
+        while len(res) < limit:
+            try:
+                event = self.events.get_nowait()
+            except queue.Empty:
+                if not self.finished and not self.process.is_alive() and self.process.exitcode is not None:
+                    try:
+                        event = self.events.get(timeout=0.1)
+                    except queue.Empty:
+                        self.finished = True
+                        res.append(("failed", "Tagging process exited with code {}".format(self.process.exitcode)))
+                        res.append(("done", []))
+                        break
+                else:
+                    break
+            if event[0] == "done":
+                self.finished = True
+            res.append(event)
+        return res
+
+    def is_finished(self):
+        """Return True when done event was received."""
+        return self.finished
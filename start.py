@@ -8,8 +8,12 @@ from GUI import AudioFrame
 from GUI import FileSection
 from GUI import AutoTaggerFrame
 from GUI import LoadingFrame
+from GUI import BatchEditFrame
+from tkinter.messagebox import showerror
+from auto.catalog import Catalog
 from threading import Thread
 from os import sep, listdir
+from os.path import normcase, abspath
 
 
 class GUILoadingFrame(LoadingFrame):
@@ -52,7 +56,7 @@ class GUILoadingFrame(LoadingFrame):
         :return returns nothing.
         """
         global file_section
-        file_section = GUIFileSection(self.win, dir_=self.folder, styles=self.styles)
+        file_section = GUIFileSection(self.win, dir_=self.folder, styles=self.styles, catalog=catalog)
         self.destroy()
         self.win.quit()
 
@@ -74,7 +78,7 @@ class GUILoadingWindow(Toplevel):
 
     def load_folder(self):
         """
-        Reload GUIFileSection.
+        Reload GUIFileSection, when the same folder is opened again only its changed files are read.
 
         :return returns nothing.
         """
@@ -82,7 +86,11 @@ class GUILoadingWindow(Toplevel):
         global audio_frame
         global tagger_frame
         tagger_frame.cur_dir = self.frame.folder
-        new_file_section = GUIFileSection(self.win, dir_=self.frame.folder, styles=self.styles)
+        if normcase(abspath(self.frame.folder)) == normcase(abspath(file_section.dir_)):
+            file_section.sync()
+            self.destroy()
+            return
+        new_file_section = GUIFileSection(self.win, dir_=self.frame.folder, styles=self.styles, catalog=catalog)
         file_section.destroy()
         file_section = new_file_section
         file_section.pack(side=RIGHT, fill=Y)
@@ -111,9 +119,20 @@ class GUIFileSection(FileSection):
         global audio_frame
 
         audio_frame.reload(widget.file.path)
+        audio_frame.prefetch(self.neighbours(widget))
         tagger_frame.pack_forget()
         audio_frame.pack(side=BOTTOM, expand=YES, fill=BOTH)
 
+    def on_click(self, widget):
+        """
+        Select file and prefetch it and its neighbours for audio frame.
+
+        :return returns nothing.
+        """
+        FileSection.on_click(self, widget)
+        if self.audio_frame:
+            self.audio_frame.prefetch([widget.file.path] + self.neighbours(widget))
+
 
 class GUIAudioFrame(AudioFrame):
     """Class that inherits AudioFrame and provide some mechanisms to link it with other widgets."""
@@ -135,10 +154,20 @@ class GUIAudioFrame(AudioFrame):
         """
         if self.is_cur_dir:
             AudioFrame.command_save(self)
-            file_section.files[self.audio_path.split(sep)[-1].split('/')[-1]].refresh()
+            file_section.refresh_files([self.audio_path])
         else:
             AudioFrame.command_save(self)
 
+    def command_undo(self):
+        """
+        Undo last save of audio tags.
+
+        :return returns nothing.
+        """
+        AudioFrame.command_undo(self)
+        if self.is_cur_dir:
+            file_section.refresh_files([self.audio_path])
+
     def command_save_as(self, path=None):
         """
         Save changes in audio tags to path.
@@ -166,25 +195,33 @@ class GUIAudioFrame(AudioFrame):
 
 class GUIAutoTaggerFrame(AutoTaggerFrame):
     """Class that inherits AutoTaggerFrame and provide some mechanisms to link it with other widgets."""
-    def __init__(self, parent=None, iap=None, aap=None, blp=None, cur_dir=None, style='Tagger', styles=None, **options):
-        AutoTaggerFrame.__init__(self, parent=parent, iap=iap, aap=aap, blp=blp, cur_dir=cur_dir, style=style,
+    def __init__(self, parent=None, iap=None, aap=None, blp=None, cur_dir=None, style='Tagger', styles=None, tp=None,
+                 **options):
+        AutoTaggerFrame.__init__(self, parent=parent, iap=iap, aap=aap, blp=blp, cur_dir=cur_dir, style=style, tp=tp,
                                  **options)
         self.win = None
         self.styles = styles
 
-    def command_auto_tag(self, path, parent=None):
+    def on_tagged(self, changed):
         """
-        Run auto tagging and reload file section.
+        Refresh rows of files changed by auto tagger in file section.
 
         :return returns nothing.
         """
-        AutoTaggerFrame.command_auto_tag(self, path, parent=parent)
+        file_section.refresh_files(changed)
 
-        global file_section
-        new_file_section = GUIFileSection(self.win, dir_=self.cur_dir, styles=self.styles)
-        file_section.destroy()
-        file_section = new_file_section
-        file_section.pack(side=RIGHT, fill=Y)
+
+class GUIBatchEditFrame(BatchEditFrame):
+    """Class that inherits BatchEditFrame and provide some mechanisms to link it with other widgets."""
+    def on_done(self, changed):
+        """
+        Refresh rows of changed files in file section and audio frame if its file was changed.
+
+        :return returns nothing.
+        """
+        file_section.refresh_files(changed)
+        if audio_frame.audio_path in changed:
+            audio_frame.reload(audio_frame.audio_path, is_cur_dir=audio_frame.is_cur_dir)
 
 
 class MenuBar(ttk.Frame):
@@ -226,6 +263,15 @@ class MenuBar(ttk.Frame):
 
         but3.pack(side=LEFT)
 
+        but4 = Menubutton(self, text='Batch', width=10, bg='white', activebackground='#f0f0f0', bd=1,
+                          highlightbackground='grey', highlightthickness=1, highlightcolor='white')
+        menu = Menu(but4, tearoff=False)
+        menu.add_command(label='Edit selected', command=command_batch_edit, underline=0)
+        menu.add_command(label='Select shown', command=(lambda: file_section.select_shown(1)), underline=0)
+        menu.add_command(label='Clear selection', command=(lambda: file_section.select_shown(0)), underline=0)
+        but4.config(menu=menu)
+        but4.pack(side=LEFT)
+
         empty_space.pack(side=LEFT, expand=YES, fill=BOTH)
 
         self.audio_frame = None
@@ -270,6 +316,26 @@ class MenuBar(ttk.Frame):
         self.audio_frame.command_save_as()
 
 
+def command_batch_edit():
+    """
+    Create new window to edit tags of selected files at once.
+
+    :return returns nothing.
+    """
+    paths = file_section.selected()
+    if not paths:
+        showerror(title='Error occurred', message='Please select files')
+        return
+    win = Toplevel(root)
+    win.title('Batch edit')
+    GUIBatchEditFrame(win, paths=paths).pack(expand=YES, fill=BOTH)
+    x = (win.winfo_screenwidth() - win.winfo_reqwidth() - 280) / 2
+    y = (win.winfo_screenheight() - win.winfo_reqheight()) / 2
+    win.wm_geometry("+%d+%d" % (x, y))
+    win.focus_set()
+    win.grab_set()
+
+
 def command_open_folder():
     """
     Create new window to choose folder with audio.
@@ -339,6 +405,10 @@ if __name__ == "__main__":
 
     global file_section
 
+    path = '.' + sep + 'auto' + sep + 'auto tagger files' + sep
+    cp = path + 'catalog.db'
+    catalog = Catalog(cp)
+
     loading_frame = GUILoadingFrame(root, style='LoadingWindow', styles=styles)
     loading_frame.win = root
     loading_frame.pack()
@@ -355,12 +425,14 @@ if __name__ == "__main__":
 
     audio_frame = GUIAudioFrame(holder, audio_path=file_section.first_file, style=style)
 
-    path = '.' + sep + 'auto' + sep + 'auto tagger files' + sep
     iap = path + 'imgs'
     aap = path + 'albums'
     blp = path + 'banlist.txt'
+    tp = path + 'templates.txt'
+    dbp = path + 'associations.db'
 
-    tagger_frame = GUIAutoTaggerFrame(holder, iap=iap, aap=aap, blp=blp, cur_dir=loading_frame.folder, styles=styles)
+    tagger_frame = GUIAutoTaggerFrame(holder, iap=iap, aap=aap, blp=blp, cur_dir=loading_frame.folder, styles=styles,
+                                      tp=tp, cp=cp, dbp=dbp)
     tagger_frame.win = root
 
     audio_frame.file_section = file_section